@@ -0,0 +1,264 @@
+import argparse
+import html
+import json
+import time
+import warnings
+from datetime import date, datetime
+from glob import glob
+
+import numpy as np
+import pandas as pd
+from bs4 import BeautifulSoup
+from cache import read_cache
+from parse import parse_game_page
+from schema import convert_rows
+
+tables = ["score", "batting", "pitching"]
+
+
+# 以前の実装（BeautifulSoupでページ全体を解析し，表ごとにDataFrameを作る）
+def legacy_get_game_info(soup, game):
+    dev_list = soup.find_all("div")
+    info = {}
+    flag = False
+    for dev in dev_list:
+        if "gameInfo02" in dev.get("class"):
+            game_info = dev.text.split("\n")
+            game_info = [item.strip() for item in game_info if item.strip()]
+            if len(game_info) == 4:
+                info["game_place"] = None
+                info["team_name_top"] = game_info[0]
+                info["team_name_bottom"] = game_info[3]
+            elif len(game_info) == 5:
+                info["game_place"] = game_info[3]
+                info["team_name_top"] = game_info[0]
+                info["team_name_bottom"] = game_info[4]
+            if flag:
+                break
+        if "dateInfo" in dev.get("class"):
+            date_info = dev.text.split("\n")
+            info["game"] = game
+            info["game_type"] = date_info[1]
+            date = date_info[2].split("(")
+            info["game_date"] = datetime.strptime(date[0], "%Y/%m/%d").date()
+            info["game_day"] = date[1][0]
+            info["game_time"] = date_info[3][:-1]
+            if flag:
+                break
+            flag = True
+
+    info_df = pd.DataFrame([info])
+    return info_df
+
+
+def legacy_get_table_info(table):
+    rows = table.find_all("tr")
+    data = []
+    for row in rows:
+        cells = row.find_all(["td", "th"])
+        row_data = []
+        for cell in cells:
+            row_data.append(cell.text.strip())
+        data.append(row_data)
+    df = pd.DataFrame(data[1:], columns=data[0])
+    return df
+
+
+def legacy_get_score_df(df, info_df):
+    df.columns = ["team_name", "1", "2", "3", "4", "5", "6", "7", "8", "9", "points"]
+    df.index = ["top", "bottom"]
+    scores = df.iloc[:, 1:].values.flatten()
+    score_df = pd.DataFrame([scores])
+    columns = []
+    columns.extend(
+        [
+            str(i) + "_" + j if i < 10 else "points_" + j
+            for i in range(1, 11)
+            for j in ["top"]
+        ]
+    )
+    columns.extend(
+        [
+            str(i) + "_" + j if i < 10 else "points_" + j
+            for i in range(1, 11)
+            for j in ["bottom"]
+        ]
+    )
+    score_df.columns = columns
+    score_df = pd.concat([info_df, score_df], axis=1)
+    return score_df
+
+
+def legacy_get_stats_df(df, info_df):
+    df = df.rename(columns={df.columns[0]: "背番号"})
+    df = df.iloc[:-1]
+    df["game"] = info_df["game"].values[0]
+    df["game_type"] = info_df["game_type"].values[0]
+    df["game_date"] = info_df["game_date"].values[0]
+    df["game_day"] = info_df["game_day"].values[0]
+    df["game_time"] = info_df["game_time"].values[0]
+    columns = df.columns[-5:].values
+    columns = np.concatenate([columns, df.columns[:-5].values])
+    df = df[columns]
+    return df
+
+
+def legacy_parse_game_page(html_content, game):
+    soup = BeautifulSoup(html_content, "html.parser")
+    table_list = soup.find_all("table")
+    info_df = legacy_get_game_info(soup, game)
+    score_df = legacy_get_table_info(table_list[0])
+    score_df = legacy_get_score_df(score_df, info_df)
+    batting_df = legacy_get_table_info(table_list[2])
+    batting_df = legacy_get_stats_df(batting_df, info_df)
+    pitching_df = legacy_get_table_info(table_list[4])
+    pitching_df = legacy_get_stats_df(pitching_df, info_df)
+    return {"score": score_df, "batting": batting_df, "pitching": pitching_df}
+
+
+def read_cached_pages(cache_dir, limit):
+    # fetch.py が保存したキャッシュから試合ページだけを読み込む
+    pages = []
+    for path in sorted(glob(f"{cache_dir}/*/*.json")):
+        with open(path, encoding="utf-8") as f:
+            url = json.load(f)["url"]
+        game = url.split("/")[-1]
+        if not game.isdigit():
+            continue
+        cached = read_cache(cache_dir, url)
+        if cached is not None:
+            pages.append((game, cached[0]))
+        if len(pages) >= limit:
+            break
+    return pages
+
+
+def to_cell(value):
+    # csvでは欠損を含む整数列が "1.0" のように保存されている
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return str(int(number)) if number.is_integer() else value
+
+
+def render_table(header, rows):
+    lines = ["<table>", "<tr>" + "".join(f"<th>{h}</th>" for h in header) + "</tr>"]
+    for row in rows:
+        cells = "".join(f"<td>{html.escape(to_cell(value))}</td>" for value in row)
+        lines.append(f"<tr>{cells}</tr>")
+    lines.append("</table>")
+    return "\n".join(lines)
+
+
+def render_game_page(score, batting, pitching):
+    game_date = date.fromisoformat(score["game_date"])
+    place = f"\n{html.escape(score['game_place'])}" if score["game_place"] else ""
+    innings = [str(i) for i in range(1, 10)]
+    score_rows = [
+        [score[f"team_name_{side}"]]
+        + [score[f"{i}_{side}"] for i in innings]
+        + [score[f"points_{side}"]]
+        for side in ["top", "bottom"]
+    ]
+    # 先頭列は背番号，最終行は合計
+    stats = []
+    for df in [batting, pitching]:
+        columns = list(df.columns[5:])
+        rows = df[columns].to_numpy().tolist() + [["合計"] + [""] * (len(columns) - 1)]
+        stats.append(render_table(["#"] + columns[1:], rows))
+    return "\n".join(
+        [
+            "<html><body>",
+            '<div class="dateInfo">',
+            score["game_type"],
+            f"{game_date:%Y/%m/%d}({score['game_day']})",
+            f"{score['game_time']}~",
+            "</div>",
+            '<div class="gameInfo02">',
+            f"{html.escape(score['team_name_top'])}\nvs\n試合終了{place}",
+            html.escape(score["team_name_bottom"]),
+            "</div>",
+            render_table(["チーム"] + innings + ["計"], score_rows),
+            "<table><tr><td></td></tr></table>",
+            stats[0],
+            "<table><tr><td></td></tr></table>",
+            stats[1],
+            "</body></html>",
+        ]
+    )
+
+
+def make_fixture_pages(team, limit):
+    # キャッシュがない場合は保存済みのcsvから試合ページと同じ構造のhtmlを作る
+    data = {
+        table: pd.read_csv(f"{team}/{table}.csv", dtype=str, keep_default_na=False)
+        for table in tables
+    }
+    pages = []
+    for _, score in data["score"].head(limit).iterrows():
+        game = score["game"]
+        batting = data["batting"][data["batting"]["game"] == game]
+        pitching = data["pitching"][data["pitching"]["game"] == game]
+        pages.append((game, render_game_page(score, batting, pitching)))
+    return pages
+
+
+def is_same_result(legacy, result):
+    for table in tables:
+        df = legacy[table]
+        columns = list(df.columns)
+        rows = convert_rows(table, columns, df.to_numpy().tolist())
+        if (columns, rows) != (result[table][0], result[table][1]):
+            return False
+    return True
+
+
+def measure(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(args):
+    warnings.simplefilter("ignore", pd.errors.SettingWithCopyWarning)
+    pages = read_cached_pages(args.cache_dir, args.limit)
+    if len(pages) == 0:
+        print(f"{args.cache_dir} に試合ページがないため {args.team} のcsvから作成する")
+        pages = make_fixture_pages(args.team, args.limit)
+
+    total_legacy = 0
+    total_parse = 0
+    mismatches = 0
+    print(f"{'game':>10} {'legacy(ms)':>12} {'parse_game_page(ms)':>20}")
+    for game, html_content in pages:
+        if not is_same_result(
+            legacy_parse_game_page(html_content, game),
+            parse_game_page(html_content, game),
+        ):
+            mismatches += 1
+        legacy_ms = measure(
+            lambda: legacy_parse_game_page(html_content, game), args.repeat
+        )
+        parse_ms = measure(lambda: parse_game_page(html_content, game), args.repeat)
+        total_legacy += legacy_ms
+        total_parse += parse_ms
+        print(f"{game:>10} {legacy_ms:>12.3f} {parse_ms:>20.3f}")
+    print(
+        f"{'mean':>10} {total_legacy / len(pages):>12.3f} "
+        f"{total_parse / len(pages):>20.3f}"
+    )
+    print(f"speedup: {total_legacy / total_parse:.1f}x, mismatches: {mismatches}")
+    return 1 if mismatches > 0 else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    # fetch.py のキャッシュ（なければチームのcsvから作った試合ページを使う）
+    parser.add_argument("--cache-dir", type=str, default="cache")
+    parser.add_argument("--team", type=str, default="ryunen_busters")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    exit(main(args))
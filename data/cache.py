@@ -0,0 +1,73 @@
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime
+
+
+class CacheMissError(Exception):
+    pass
+
+
+def get_cache_path(cache_dir, url):
+    # URLのハッシュ値の先頭2文字でフォルダを分ける
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return f"{cache_dir}/{key[:2]}/{key}"
+
+
+def replace_file(path, content, mode="wb"):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, mode) as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def read_cache(cache_dir, url):
+    path = get_cache_path(cache_dir, url)
+    if not os.path.exists(f"{path}.json") or not os.path.exists(f"{path}.html.gz"):
+        return None
+    with open(f"{path}.json", encoding="utf-8") as f:
+        meta = json.load(f)
+    with gzip.open(f"{path}.html.gz", "rt", encoding="utf-8") as f:
+        return f.read(), meta
+
+
+def write_meta(cache_dir, url, meta):
+    path = get_cache_path(cache_dir, url)
+    content = json.dumps(meta, ensure_ascii=False, indent=1)
+    replace_file(f"{path}.json", content, mode="w")
+
+
+def write_cache(cache_dir, url, html_content, headers):
+    path = get_cache_path(cache_dir, url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    replace_file(f"{path}.html.gz", gzip.compress(html_content.encode("utf-8")))
+    now = datetime.now().isoformat(timespec="seconds")
+    meta = {
+        "url": url,
+        "fetched_at": now,
+        "validated_at": now,
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+    }
+    write_meta(cache_dir, url, meta)
+
+
+def touch_cache(cache_dir, url, meta):
+    # 304で内容が変わっていないことを確認した時刻だけを更新する
+    meta = {**meta, "validated_at": datetime.now().isoformat(timespec="seconds")}
+    write_meta(cache_dir, url, meta)
+
+
+def calc_cache_age(meta):
+    validated_at = datetime.fromisoformat(meta["validated_at"])
+    return (datetime.now() - validated_at).total_seconds()
+
+
+def get_validators(meta):
+    headers = {}
+    if meta.get("etag") is not None:
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified") is not None:
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
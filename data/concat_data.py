@@ -1,8 +1,199 @@
 import argparse
+import csv
+import json
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from glob import glob
 
 import pandas as pd
+import pyarrow.parquet as pq
+from manifest import data_tables
+from schema import align_arrow_table, get_schema_version, parts_to_arrow, schemas
+from storage import get_table_parts, open_season, sort_entries, write_csv_rows
+
+
+class ConsolidatedWriter:
+    # シーズンごとに行を書き足し，閉じるときに一時ファイルから置き換える
+    def __init__(self, folder):
+        self.folder = folder
+        self.files = {}
+        self.csv_writers = {}
+        self.parquet_writers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, table, arrow_table):
+        if table not in self.files:
+            f = open(
+                f"{self.folder}/{table}.csv.tmp", "w", newline="", encoding="utf-8"
+            )
+            self.files[table] = f
+            self.csv_writers[table] = csv.writer(f, lineterminator="\n")
+            self.csv_writers[table].writerow(arrow_table.column_names)
+            # 型を固定した列指向形式でも保存する（アプリはこちらを優先して読み込む）
+            self.parquet_writers[table] = pq.ParquetWriter(
+                f"{self.folder}/{table}.parquet.tmp",
+                schemas[table],
+                compression="zstd",
+            )
+        write_csv_rows(self.csv_writers[table], arrow_table)
+        self.parquet_writers[table].write_table(arrow_table)
+
+    def close(self):
+        for table in list(self.files):
+            self.files.pop(table).close()
+            self.parquet_writers.pop(table).close()
+            os.replace(f"{self.folder}/{table}.csv.tmp", f"{self.folder}/{table}.csv")
+            os.replace(
+                f"{self.folder}/{table}.parquet.tmp", f"{self.folder}/{table}.parquet"
+            )
+
+    def abort(self):
+        # 書き込みに失敗した場合は既存のファイルを残す
+        for table in list(self.files):
+            self.files.pop(table).close()
+            self.parquet_writers.pop(table).close()
+            os.remove(f"{self.folder}/{table}.csv.tmp")
+            os.remove(f"{self.folder}/{table}.parquet.tmp")
+
+
+def get_team_years(team):
+    # シーズンのログがある年と，チーム全体のcsvに含まれる年
+    years = {int(path.split("/")[-2]) for path in glob(f"{team}/*/games.jsonl")}
+    if os.path.exists(f"{team}/score.csv"):
+        game_date = pd.read_csv(f"{team}/score.csv", usecols=["game_date"])
+        years |= set(game_date["game_date"].str[:4].astype(int))
+    return years
+
+
+def get_state_path(team):
+    return f"{team}/partitions.json"
+
+
+def load_state(team):
+    path = get_state_path(team)
+    if not os.path.exists(path):
+        return {"years": None, "seasons": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(team, state):
+    path = get_state_path(team)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def get_partition_path(team, year, table):
+    return f"{team}/{year}/{table}.parquet"
+
+
+def get_log_path(team, year):
+    return f"{team}/{year}/games.jsonl"
+
+
+def get_fingerprint(team, year, team_years):
+    # シーズンのログのサイズ・更新時刻とスキーマから変更の有無を判定する
+    path = get_log_path(team, year)
+    if not os.path.exists(path):
+        # 以前の形式のデータがある年だけログに移し替え，ない年はフォルダを作らない
+        if year not in team_years and not os.path.isdir(f"{team}/{year}"):
+            return None
+        open_season(team, year).close()
+        if not os.path.exists(path):
+            return None
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns, get_schema_version()]
+
+
+def is_changed(team, year, state, fingerprint):
+    if state["seasons"].get(str(year)) != fingerprint:
+        return True
+    if fingerprint is None:
+        return False
+    return not all(
+        os.path.exists(get_partition_path(team, year, table)) for table in data_tables
+    )
+
+
+def build_partition(team, year):
+    entries = []
+    if os.path.exists(get_log_path(team, year)):
+        with open_season(team, year) as log:
+            entries = sort_entries(log.read_all())
+    for table in data_tables:
+        path = get_partition_path(team, year, table)
+        if len(entries) == 0:
+            if os.path.exists(path):
+                os.remove(path)
+            continue
+        arrow_table = parts_to_arrow(table, get_table_parts(entries, table))
+        pq.write_table(arrow_table, f"{path}.tmp", compression="zstd")
+        os.replace(f"{path}.tmp", path)
+
+
+def read_partition(team, year):
+    tables = {}
+    for table in data_tables:
+        path = get_partition_path(team, year, table)
+        if os.path.exists(path):
+            tables[table] = align_arrow_table(pq.read_table(path), table)
+    return tables
+
+
+def read_partitions(executor, team, years, window):
+    # 読み込み中・書き出し待ちのシーズンをwindow個までにし，
+    # シーズン数によらず同時に持つデータの量を一定にする
+    futures = deque()
+    for year in years:
+        futures.append(executor.submit(read_partition, team, year))
+        if len(futures) >= window:
+            yield futures.popleft().result()
+    while len(futures) > 0:
+        yield futures.popleft().result()
+
+
+def write_consolidated(team, years, workers=4, force=False):
+    # 指定範囲外でもデータがある年は含め，チーム全体のファイルから消さない
+    team_years = get_team_years(team)
+    years = sorted(set(years) | team_years, reverse=True)
+    state = load_state(team)
+    if force:
+        state = {"years": None, "seasons": {}}
+    fingerprints = {year: get_fingerprint(team, year, team_years) for year in years}
+    changed = [
+        year for year in years if is_changed(team, year, state, fingerprints[year])
+    ]
+    consolidated_exists = all(
+        os.path.exists(f"{team}/{table}.parquet") for table in data_tables
+    )
+    if len(changed) == 0 and state["years"] == years and consolidated_exists:
+        return changed
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # ログが変わったシーズンだけ列指向形式のファイルを作り直す
+        list(executor.map(lambda year: build_partition(team, year), changed))
+        data_years = [year for year in years if fingerprints[year] is not None]
+        # 各シーズンのファイルを並行して読み込み，年の新しい順に書き足す
+        with ConsolidatedWriter(team) as writer:
+            for tables in read_partitions(executor, team, data_years, workers):
+                for table, arrow_table in tables.items():
+                    writer.write(table, arrow_table)
+
+    state["years"] = years
+    state["seasons"] = {str(year): fingerprints[year] for year in years}
+    save_state(team, state)
+    return changed
 
 
 def main(args):
@@ -11,27 +202,9 @@ def main(args):
         print(f"folder: {folder} does not exist")
         return 1
 
-    score_df_list = []
-    batting_df_list = []
-    pitching_df_list = []
-
-    for year in range(args.last_year, args.first_year, -1):
-        files = glob(f"{folder}/{year}/*")
-        for file in files:
-            filename = file.split("/")[-1].split(".")[0]
-            if filename == "score":
-                score_df_list.append(pd.read_csv(file))
-            elif filename == "batting":
-                batting_df_list.append(pd.read_csv(file))
-            elif filename == "pitching":
-                pitching_df_list.append(pd.read_csv(file))
-    score_df_all = pd.concat(score_df_list, axis=0, ignore_index=True)
-    batting_df_all = pd.concat(batting_df_list, axis=0, ignore_index=True)
-    pitching_df_all = pd.concat(pitching_df_list, axis=0, ignore_index=True)
-
-    score_df_all.to_csv(f"{folder}/score.csv", index=False)
-    batting_df_all.to_csv(f"{folder}/batting.csv", index=False)
-    pitching_df_all.to_csv(f"{folder}/pitching.csv", index=False)
+    years = range(args.first_year, args.last_year + 1)
+    changed = write_consolidated(folder, years, args.workers, args.force)
+    print(f"rebuilt seasons: {changed}")
 
 
 if __name__ == "__main__":
@@ -39,5 +212,8 @@ if __name__ == "__main__":
     parser.add_argument("--team", type=str, default="ryunen_busters")
     parser.add_argument("--first-year", type=int, default=2020)
     parser.add_argument("--last-year", type=int, default=2025)
+    parser.add_argument("--workers", type=int, default=4)
+    # 変更の有無にかかわらずすべてのシーズンを作り直す
+    parser.add_argument("--force", action="store_true")
     args = parser.parse_args()
     main(args)
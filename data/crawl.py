@@ -0,0 +1,71 @@
+import argparse
+import time
+
+import requests
+from concat_data import get_team_years, write_consolidated
+from fetch import add_fetch_arguments, create_fetcher, get_executor
+from manifest import load_manifest, save_manifest, seed_manifest
+from scraping import collect_season, get_known_games, submit_season
+from storage import open_season, write_season
+
+
+def submit_seasons(executor, fetcher, team, years, manifest, full=False, refetch=False):
+    # 一覧ページは順番に読み，試合ページは共有のワーカーで並行して取得する
+    for year in years:
+        log = open_season(team, year)
+        known_games = get_known_games(log, refetch)
+        seed_manifest(manifest, known_games, year)
+        try:
+            futures = submit_season(executor, fetcher, team, year, known_games, full)
+        except requests.RequestException as e:
+            print(f"team: {team}, year: {year}")
+            print(f"error: {e}")
+            futures = []
+        yield year, log, futures
+
+
+def prefetch(seasons):
+    # 次のシーズンの取得を始めてから前のシーズンを書き出し，
+    # 結果を持ったまま待つシーズンを2つまでにする
+    seasons = iter(seasons)
+    current = next(seasons, None)
+    while current is not None:
+        following = next(seasons, None)
+        yield current
+        current = following
+
+
+def main(args):
+    start = time.perf_counter()
+    years = range(args.first_year, args.last_year + 1)
+    fetcher = create_fetcher(args)
+    refetch = args.replay or args.recheck
+    with get_executor(args) as executor:
+        for team in args.teams:
+            manifest = load_manifest(team)
+            seasons = submit_seasons(
+                executor, fetcher, team, years, manifest, args.full or refetch, refetch
+            )
+            # シーズンごとに結果を受け取り，年ごとのファイルに書き出す
+            for year, log, futures in prefetch(seasons):
+                entries = collect_season(
+                    log, futures, manifest, year, desc=f"{team} {year}"
+                )
+                del futures
+                if len(entries) == 0:
+                    print(f"{team}: {year}年のデータがありません")
+                    continue
+                write_season(f"{team}/{year}", entries)
+            save_manifest(team, manifest)
+            write_consolidated(team, get_team_years(team), args.workers)
+    print(f"elapsed: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--teams", type=str, nargs="+", default=["ryunen_busters"])
+    parser.add_argument("--first-year", type=int, default=2019)
+    parser.add_argument("--last-year", type=int, default=2025)
+    add_fetch_arguments(parser)
+    args = parser.parse_args()
+    main(args)
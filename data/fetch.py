@@ -0,0 +1,147 @@
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import requests
+from cache import (
+    CacheMissError,
+    calc_cache_age,
+    get_validators,
+    read_cache,
+    touch_cache,
+    write_cache,
+)
+from requests.adapters import HTTPAdapter
+
+
+class RateLimiter:
+    # トークンバケット方式で全スレッド合計のリクエスト頻度を制限する
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def create_session(pool_size):
+    session = requests.Session()
+    # 再試行もレート制限を通すため，アダプタでは再試行せずFetcherで行う
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+retry_statuses = [429, 500, 502, 503, 504]
+
+
+class Fetcher:
+    # セッション・レート制限・生htmlのキャッシュをまとめて扱う
+    def __init__(
+        self,
+        workers,
+        rate,
+        cache_dir=None,
+        replay=False,
+        max_age=0,
+        retries=3,
+        backoff_factor=1,
+    ):
+        if replay and cache_dir is None:
+            raise ValueError("replay requires cache_dir")
+        self.cache_dir = cache_dir
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.replay = replay
+        self.max_age = max_age
+        if replay:
+            # キャッシュだけを読むため通信の準備はしない（プロセス間で受け渡せる）
+            self.session = None
+            self.limiter = None
+        else:
+            self.session = create_session(workers)
+            self.limiter = RateLimiter(rate)
+
+    def get(self, url):
+        cached = None
+        if self.cache_dir is not None:
+            cached = read_cache(self.cache_dir, url)
+        if self.replay:
+            if cached is None:
+                raise CacheMissError(url)
+            return cached[0]
+        if cached is not None and calc_cache_age(cached[1]) < self.max_age:
+            return cached[0]
+
+        headers = {} if cached is None else get_validators(cached[1])
+        response = self.request(url, headers)
+        if response.status_code == 304 and cached is not None:
+            touch_cache(self.cache_dir, url, cached[1])
+            return cached[0]
+        response.raise_for_status()
+        if self.cache_dir is not None:
+            write_cache(self.cache_dir, url, response.text, response.headers)
+        return response.text
+
+    def request(self, url, headers):
+        # 再試行のたびにレート制限のトークンを取得し，間隔を倍にしながら待つ
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                time.sleep(self.backoff_factor * 2 ** (attempt - 1))
+            self.limiter.acquire()
+            try:
+                response = self.session.get(url, headers=headers, timeout=30)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                continue
+            if response.status_code not in retry_statuses or attempt == self.retries:
+                return response
+
+
+def add_fetch_arguments(parser):
+    # 同時に取得する試合ページ数と，全体で1秒あたりに送るリクエスト数の上限
+    # （既定は従来と同じ3秒に1回）
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=1 / 3)
+    # 取得済みの試合だけのページで打ち切らず，すべての一覧ページを確認する
+    parser.add_argument("--full", action="store_true")
+    # 生htmlのキャッシュ（空文字で無効）と，再検証せずに使う経過秒数
+    parser.add_argument("--cache-dir", type=str, default="cache")
+    parser.add_argument("--max-age", type=float, default=0)
+    # 通信せずにキャッシュだけから取得・解析をやり直す
+    parser.add_argument("--replay", action="store_true")
+    # 取得済みの試合ページも再検証し，内容が変わった試合だけ保存し直す
+    parser.add_argument("--recheck", action="store_true")
+
+
+def create_fetcher(args):
+    return Fetcher(
+        args.workers,
+        args.rate,
+        cache_dir=args.cache_dir or None,
+        replay=args.replay,
+        max_age=args.max_age,
+    )
+
+
+def get_executor(args):
+    # キャッシュからの解析はCPU処理だけなのでプロセスで並列化する
+    if args.replay:
+        return ProcessPoolExecutor(max_workers=args.workers)
+    return ThreadPoolExecutor(max_workers=args.workers)
@@ -0,0 +1,50 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+data_tables = ["score", "batting", "pitching"]
+
+
+def get_manifest_path(team):
+    return f"{team}/manifest.json"
+
+
+def load_manifest(team):
+    path = get_manifest_path(team)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(team, manifest):
+    path = get_manifest_path(team)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def calc_content_hash(tables):
+    # 解析後の表から求め，ページの表以外の部分が変わっても同じ値になるようにする
+    content = json.dumps(tables, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def is_known_content(manifest, game, content_hash):
+    return manifest.get(str(game), {}).get("hash") == content_hash
+
+
+def update_manifest(manifest, game, year, content_hash=None):
+    manifest[str(game)] = {
+        "year": year,
+        "hash": content_hash,
+        "scraped_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def seed_manifest(manifest, known_games, year):
+    # 保存済みでマニフェストにない試合はハッシュ値なしで登録する
+    for game in set(known_games) - set(manifest):
+        update_manifest(manifest, game, year)
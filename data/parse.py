@@ -0,0 +1,90 @@
+from datetime import datetime
+
+import lxml.html
+from schema import convert_rows
+
+game_columns = ["game", "game_type", "game_date", "game_day", "game_time"]
+
+info_columns = game_columns + ["game_place", "team_name_top", "team_name_bottom"]
+
+score_columns = info_columns + [
+    f"{i}_{side}" if i < 10 else f"points_{side}"
+    for side in ["top", "bottom"]
+    for i in range(1, 11)
+]
+
+
+def select_class(root, tag, class_name):
+    # class属性に指定したクラスを含む要素だけを取り出す
+    class_attr = "concat(' ', normalize-space(@class), ' ')"
+    return root.xpath(f"//{tag}[contains({class_attr}, ' {class_name} ')]")
+
+
+def parse_game_urls(html_content, url_header):
+    root = lxml.html.fromstring(html_content)
+    game_urls = []
+    for link_text in root.xpath("//a/@href"):
+        last_part = link_text.split("/")[-1]
+        if last_part.isdigit():
+            game_urls.append(url_header + "/" + last_part)
+    return game_urls
+
+
+def parse_game_info(root, game):
+    date_info = select_class(root, "div", "dateInfo")[0].text_content().split("\n")
+    date = date_info[2].split("(")
+    info = {
+        "game": game,
+        "game_type": date_info[1],
+        "game_date": datetime.strptime(date[0], "%Y/%m/%d").date(),
+        "game_day": date[1][0],
+        "game_time": date_info[3][:-1],
+    }
+
+    game_info = select_class(root, "div", "gameInfo02")[0].text_content().split("\n")
+    game_info = [item.strip() for item in game_info if item.strip()]
+    if len(game_info) == 4:
+        info["game_place"] = None
+        info["team_name_top"] = game_info[0]
+        info["team_name_bottom"] = game_info[3]
+    elif len(game_info) == 5:
+        info["game_place"] = game_info[3]
+        info["team_name_top"] = game_info[0]
+        info["team_name_bottom"] = game_info[4]
+    return info
+
+
+def parse_table(table):
+    return [
+        [cell.text_content().strip() for cell in row.xpath(".//td|.//th")]
+        for row in table.xpath(".//tr")
+    ]
+
+
+def parse_score(rows, info):
+    # ヘッダー行と先攻・後攻の2行（チーム名・1〜9回・計）からなる
+    if len(rows) != 3 or any(len(row) != 11 for row in rows[1:]):
+        raise ValueError("unexpected score table")
+    record = [info.get(column) for column in info_columns]
+    records = [record + rows[1][1:] + rows[2][1:]]
+    return score_columns, convert_rows("score", score_columns, records)
+
+
+def parse_stats(rows, info, table):
+    # 先頭列は背番号，最終行は合計なので除く
+    columns = game_columns + ["背番号"] + rows[0][1:]
+    game_record = [info[column] for column in game_columns]
+    records = [game_record + row for row in rows[1:-1]]
+    return columns, convert_rows(table, columns, records)
+
+
+def parse_game_page(html_content, game):
+    # 必要な要素だけをXPathで取り出し，列名と型を変換した行のリストを返す
+    root = lxml.html.fromstring(html_content)
+    table_list = root.xpath("//table")
+    info = parse_game_info(root, game)
+    return {
+        "score": parse_score(parse_table(table_list[0]), info),
+        "batting": parse_stats(parse_table(table_list[2]), info, "batting"),
+        "pitching": parse_stats(parse_table(table_list[4]), info, "pitching"),
+    }
@@ -2,13 +2,8 @@
 
 first_year="${1:-2019}"
 last_year="${2:-2025}"
-team="${3:-ryunen_busters}"
+teams="${@:3}"
+teams="${teams:-ryunen_busters}"
 
-for year in $(seq $first_year $last_year); do
-    echo "Scraping data for year $year"
-    python scraping.py --team $team --year $year
-done
+python crawl.py --teams $teams --first-year $first_year --last-year $last_year
 echo "Scraping completed"
-
-python concat_data.py --team $team --first-year $first_year --last-year $last_year
-echo "Data concatenated"
\ No newline at end of file
@@ -0,0 +1,171 @@
+import hashlib
+from datetime import date
+
+import pyarrow as pa
+
+game_fields = [
+    ("game", pa.int64()),
+    ("game_type", pa.string()),
+    ("game_date", pa.date32()),
+    ("game_day", pa.string()),
+    ("game_time", pa.string()),
+]
+
+score_schema = pa.schema(
+    game_fields
+    + [
+        ("game_place", pa.string()),
+        ("team_name_top", pa.string()),
+        ("team_name_bottom", pa.string()),
+    ]
+    + [(f"{i}_top", pa.int8()) for i in range(1, 10)]
+    + [("points_top", pa.int16())]
+    + [(f"{i}_bottom", pa.int8()) for i in range(1, 10)]
+    + [("points_bottom", pa.int16())]
+)
+
+batting_schema = pa.schema(
+    game_fields
+    + [
+        ("背番号", pa.string()),
+        ("選手名", pa.string()),
+        ("出場", pa.string()),
+        ("打順", pa.string()),
+        ("守備", pa.string()),
+    ]
+    + [
+        (column, pa.int8())
+        for column in [
+            "打席",
+            "打数",
+            "安打",
+            "本",
+            "打点",
+            "得点",
+            "盗塁",
+            "二塁打",
+            "三塁打",
+            "得点圏打数",
+            "得点圏安打",
+            "三振",
+            "四球",
+            "死球",
+            "犠打",
+            "犠飛",
+            "併殺打",
+            "敵失",
+            "失策",
+            "盗塁阻止",
+            "四死球",
+        ]
+    ]
+)
+
+pitching_schema = pa.schema(
+    game_fields
+    + [
+        ("背番号", pa.string()),
+        ("選手名", pa.string()),
+        ("勝敗", pa.string()),
+        ("投球回", pa.string()),
+        ("投球数", pa.int16()),
+        ("失点", pa.int8()),
+        ("自責点", pa.int8()),
+        ("完投", pa.string()),
+        ("完封", pa.string()),
+        ("被安打", pa.int8()),
+        ("被本塁打", pa.int8()),
+        ("奪三振", pa.int8()),
+        ("与四球", pa.int8()),
+        ("与死球", pa.int8()),
+        ("ボーク", pa.int8()),
+        ("暴投", pa.int8()),
+        ("登板順", pa.int8()),
+        ("与四死球", pa.int8()),
+    ]
+)
+
+schemas = {
+    "score": score_schema,
+    "batting": batting_schema,
+    "pitching": pitching_schema,
+}
+
+
+def get_schema_version():
+    # スキーマを変更したときに保存済みのファイルを作り直すための値
+    content = "\n".join(str(schemas[table]) for table in sorted(schemas))
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()[:12]
+
+
+def to_int(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, int):
+        return value
+    try:
+        # 以前のcsvでは欠損を含む列が "1.0" のように保存されている
+        return int(float(value))
+    except ValueError:
+        return None
+
+
+def to_str(value):
+    if value is None or value == "":
+        return None
+    return str(value)
+
+
+def to_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def get_converter(data_type):
+    if pa.types.is_integer(data_type):
+        return to_int
+    elif pa.types.is_date(data_type):
+        return to_date
+    return to_str
+
+
+def convert_rows(table, columns, rows):
+    # ページから取り出した文字列をスキーマの型（整数・日付・文字列）に変換する
+    types = {field.name: field.type for field in schemas[table]}
+    converters = [get_converter(types.get(column, pa.string())) for column in columns]
+    return [[convert(value) for convert, value in zip(converters, row)] for row in rows]
+
+
+def parts_to_arrow(table, parts):
+    # 試合ごとに異なりうる列の並びを吸収し，スキーマの順の列にまとめる
+    schema = schemas[table]
+    converters = [get_converter(field.type) for field in schema]
+    values = [[] for _ in schema.names]
+    for columns, rows in parts:
+        positions = {column: i for i, column in enumerate(columns)}
+        for j, name in enumerate(schema.names):
+            i = positions.get(name)
+            convert = converters[j]
+            values[j].extend(
+                convert(row[i]) if i is not None and i < len(row) else None
+                for row in rows
+            )
+    return pa.Table.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(values, schema)],
+        schema=schema,
+    )
+
+
+def align_arrow_table(arrow_table, table):
+    # 古いスキーマで保存されたファイルも現在のスキーマの列・型にそろえる
+    schema = schemas[table]
+    columns = [
+        (
+            arrow_table[field.name].cast(field.type)
+            if field.name in arrow_table.column_names
+            else pa.nulls(arrow_table.num_rows, type=field.type)
+        )
+        for field in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
@@ -0,0 +1,225 @@
+import csv
+import json
+import os
+import shutil
+from glob import glob
+
+import pandas as pd
+from manifest import data_tables
+from schema import convert_rows, parts_to_arrow
+
+
+class SeasonLog:
+    # 1試合を1行のJSONとして追記し，試合IDから行の位置を引く索引を持つ
+    # 追記はbatch_size試合分ずつまとめて書き込む
+    def __init__(self, folder, batch_size=20):
+        self.folder = folder
+        self.log_path = f"{folder}/games.jsonl"
+        self.index_path = f"{folder}/games.idx.json"
+        self.batch_size = batch_size
+        self.buffer = []
+        self.size = 0
+        self.index = self.load_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def exists(self):
+        return os.path.exists(self.log_path)
+
+    def load_index(self):
+        if not self.exists():
+            return {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                index = json.load(f)
+            if index["size"] == os.path.getsize(self.log_path):
+                self.size = index["size"]
+                return index["games"]
+        # 索引がない・ログと合わない場合は先頭から読み直して作り直す
+        return self.rebuild_index()
+
+    def iter_lines(self):
+        offset = 0
+        with open(self.log_path, "rb") as f:
+            for line in f:
+                # 書き込み途中で止まった最終行は読まない
+                if not line.endswith(b"\n"):
+                    break
+                yield offset, line
+                offset += len(line)
+
+    def rebuild_index(self):
+        index = {}
+        end = 0
+        for offset, line in self.iter_lines():
+            index[json.loads(line)["game"]] = [offset, len(line)]
+            end = offset + len(line)
+        with open(self.log_path, "r+b") as f:
+            f.truncate(end)
+        self.size = end
+        return index
+
+    def append(self, game, tables):
+        entry = {"game": str(game)}
+        for table, (columns, records) in tables.items():
+            entry[table] = {"columns": columns, "records": records}
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        line = line.encode("utf-8")
+        # 同じ試合を追記し直した場合は新しい行を参照する
+        self.index[str(game)] = [self.size, len(line)]
+        self.size += len(line)
+        self.buffer.append(line)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if len(self.buffer) == 0:
+            return
+        # 試合のないシーズンのフォルダを作らないよう，最初の書き込みで作る
+        os.makedirs(self.folder, exist_ok=True)
+        with open(self.log_path, "ab") as f:
+            f.write(b"".join(self.buffer))
+        self.buffer = []
+
+    def read(self, game):
+        self.flush()
+        offset, length = self.index[str(game)]
+        with open(self.log_path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.read(length))
+
+    def read_all(self):
+        # 先頭から1回だけ読み，索引が指している行だけを返す
+        self.flush()
+        if not self.exists():
+            return []
+        offsets = {offset for offset, _ in self.index.values()}
+        return [
+            json.loads(line) for offset, line in self.iter_lines() if offset in offsets
+        ]
+
+    def compact(self):
+        # 追記し直して参照されなくなった行が半分を超えたら詰めて書き直す
+        live_size = sum(length for _, length in self.index.values())
+        if os.path.getsize(self.log_path) <= live_size * 2:
+            return
+        games = {offset: game for game, (offset, _) in self.index.items()}
+        index = {}
+        tmp_path = f"{self.log_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            for offset, line in self.iter_lines():
+                if offset in games:
+                    index[games[offset]] = [f.tell(), len(line)]
+                    f.write(line)
+        os.replace(tmp_path, self.log_path)
+        self.index = index
+        self.size = os.path.getsize(self.log_path)
+
+    def close(self):
+        self.flush()
+        if not self.exists():
+            return
+        self.compact()
+        index = {"size": os.path.getsize(self.log_path), "games": self.index}
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+
+def read_table_records(df, table):
+    columns = list(df.columns)
+    return columns, convert_rows(table, columns, df.values.tolist())
+
+
+def read_csv_games(team, year):
+    # 年ごとのcsv（なければチーム全体のcsvの該当年）を試合ごとに分ける
+    games = {}
+    for table in data_tables:
+        year_path = f"{team}/{year}/{table}.csv"
+        team_path = f"{team}/{table}.csv"
+        if os.path.exists(year_path):
+            df = pd.read_csv(year_path, dtype=str, keep_default_na=False)
+        elif os.path.exists(team_path):
+            df = pd.read_csv(team_path, dtype=str, keep_default_na=False)
+            df = df[df["game_date"].str[:4] == str(year)]
+        else:
+            continue
+        for game, rows in df.groupby("game", sort=False):
+            games.setdefault(game, {})[table] = read_table_records(rows, table)
+    return games
+
+
+def read_game_dir(path):
+    tables = {}
+    for table in data_tables:
+        if os.path.exists(f"{path}/{table}.csv"):
+            df = pd.read_csv(f"{path}/{table}.csv", dtype=str, keep_default_na=False)
+            tables[table] = read_table_records(df, table)
+    return tables
+
+
+def migrate_season(team, year, log):
+    # 試合ごとのフォルダと年・チーム単位のcsvからログを作り，フォルダは削除する
+    game_dirs = {
+        os.path.basename(path): path
+        for path in glob(f"{team}/{year}/*")
+        if os.path.isdir(path) and os.path.basename(path).isdigit()
+    }
+    csv_games = read_csv_games(team, year)
+    for game, tables in csv_games.items():
+        if game in game_dirs:
+            tables = read_game_dir(game_dirs[game])
+        log.append(game, tables)
+    for game in sorted(set(game_dirs) - set(csv_games), reverse=True):
+        log.append(game, read_game_dir(game_dirs[game]))
+    log.close()
+    for path in game_dirs.values():
+        shutil.rmtree(path)
+
+
+def open_season(team, year):
+    log = SeasonLog(f"{team}/{year}")
+    if not log.exists():
+        migrate_season(team, year, log)
+    return log
+
+
+def get_entry_date(entry):
+    for table in data_tables:
+        if table in entry and len(entry[table]["records"]) > 0:
+            i = entry[table]["columns"].index("game_date")
+            return str(entry[table]["records"][0][i])[:10]
+    return ""
+
+
+def sort_entries(entries):
+    # 日付の新しい順に並べ，同じ日の試合は追記した順を保つ
+    return sorted(entries, key=get_entry_date, reverse=True)
+
+
+def get_table_parts(entries, table):
+    return [
+        (entry[table]["columns"], entry[table]["records"])
+        for entry in entries
+        if table in entry
+    ]
+
+
+def write_csv_rows(writer, arrow_table):
+    writer.writerows(zip(*[column.to_pylist() for column in arrow_table.columns]))
+
+
+def write_season(folder, entries):
+    for table in data_tables:
+        arrow_table = parts_to_arrow(table, get_table_parts(entries, table))
+        tmp_path = f"{folder}/{table}.csv.tmp"
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(arrow_table.column_names)
+            write_csv_rows(writer, arrow_table)
+        os.replace(tmp_path, f"{folder}/{table}.csv")
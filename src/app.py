@@ -1,11 +1,5 @@
 import pandas as pd
 import streamlit as st
-from lib.calculate import (
-    calc_points_diff,
-    get_opponent_team,
-    get_teams_url,
-    win_or_lose,
-)
 
 # from streamlit_gsheets import GSheetsConnection
 from lib.display import (
@@ -14,8 +8,17 @@ from lib.display import (
     display_player_data,
     display_sabermetrics,
     display_score_data,
+    display_team_comparison,
+    display_team_filter,
 )
 from lib.info import team_dict
+from lib.load import (
+    get_available_teams,
+    load_page_data,
+    load_team_data,
+    load_team_summaries,
+)
+from lib.profiling import finish_profile, stage, start_profile
 
 st.set_page_config(
     page_title="分析アプリ",
@@ -26,41 +29,51 @@ pd.set_option("display.max_colwidth", 80)
 
 
 def main():
+    start_profile()
     st.title("分析アプリ")
 
     st.sidebar.title("メニュー")
-    team = st.sidebar.selectbox("チームを選択してください", team_dict.values())
-    team = [key for key, value in team_dict.items() if value == team][0]
-    selected_type = st.sidebar.radio("表示するデータ", ["スコア", "打撃成績", "投手成績", "個人成績", "指標説明"])
-
-    score_df = pd.read_csv(f"data/{team}/score.csv")
-    batting_df = pd.read_csv(f"data/{team}/batting.csv")
-    pitching_df = pd.read_csv(f"data/{team}/pitching.csv")
-
-    score_df["game_url"] = score_df["game"].apply(get_teams_url, team=team)
-    score_df["oppo_team"] = score_df.apply(
-        lambda row: get_opponent_team(row, team_dict[team]), axis=1
+    # データファイルがあるチームだけを選択肢にし，選ばれたチームだけを読み込む
+    teams = get_available_teams()
+    if len(teams) == 0:
+        st.write("##### データがありません")
+        finish_profile(None, None)
+        return
+    team = st.sidebar.selectbox(
+        "チームを選択してください", [team_dict[team] for team in teams]
     )
-    score_df["game_date"] = pd.to_datetime(score_df["game_date"])
-    score_df["result"] = score_df.apply(
-        lambda row: win_or_lose(row, team_dict[team]), axis=1
-    )
-    score_df["points_diff"] = score_df.apply(
-        lambda row: calc_points_diff(row, team_dict[team]), axis=1
+    team = [key for key, value in team_dict.items() if value == team][0]
+    selected_type = st.sidebar.radio(
+        "表示するデータ",
+        ["スコア", "打撃成績", "投手成績", "個人成績", "チーム比較", "指標説明"],
     )
 
     if selected_type == "スコア":
-        display_score_data(score_df, team, used_key_num=0)
+        with stage("load_page_data"):
+            score_df, filter_index, _ = load_page_data(team, "score")
+        display_score_data(score_df, team, used_key_num=0, filter_index=filter_index)
     elif selected_type == "打撃成績":
-        display_batting_data(score_df, batting_df, team, used_key_num=1)
+        with stage("load_page_data"):
+            batting_df, filter_index, cube = load_page_data(team, "batting")
+        display_batting_data(
+            batting_df, team, used_key_num=1, filter_index=filter_index, cube=cube
+        )
     elif selected_type == "投手成績":
-        display_pitching_data(score_df, pitching_df, team, used_key_num=2)
+        with stage("load_page_data"):
+            pitching_df, filter_index, cube = load_page_data(team, "pitching")
+        display_pitching_data(
+            pitching_df, team, used_key_num=2, filter_index=filter_index, cube=cube
+        )
     elif selected_type == "個人成績":
+        with stage("load_team_data"):
+            score_df, batting_df, pitching_df = load_team_data(team)
         players = batting_df[["背番号", "選手名"]].drop_duplicates()
         players = players[players["背番号"].str.isdigit()]
         players["背番号"] = players["背番号"].astype(int)
         players = players.sort_values("背番号")
-        players["表示名"] = players["背番号"].astype(str) + " " + players["選手名"]
+        players["表示名"] = (
+            players["背番号"].astype(str) + " " + players["選手名"].astype(str)
+        )
         selected_player = st.sidebar.selectbox(
             "選手を選択してください",
             players["表示名"],
@@ -76,8 +89,14 @@ def main():
             player_name,
             used_key_num=3,
         )
+    elif selected_type == "チーム比較":
+        selected_teams = display_team_filter(teams)
+        with stage("load_team_summaries"):
+            summaries = load_team_summaries(selected_teams)
+        display_team_comparison(summaries)
     elif selected_type == "指標説明":
         display_sabermetrics()
+    finish_profile(selected_type, team)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,395 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import tempfile
+import time
+from contextlib import nullcontext
+
+import lib.display as display
+import numpy as np
+import pandas as pd
+from lib.calculate import (
+    calc_batting_data_groupby,
+    calc_pitching_data_groupby,
+    calc_team_perspective,
+)
+from lib.cube import cube_funcs
+from lib.filtering import filtering_df
+from lib.info import low_better_batting, position_list, team_dict
+from lib.load import build_page_data, normalize_dtypes, read_team_data
+from lib.report import all_options, calc_pitching_data, calc_player_data, calc_term_data
+
+game_days = ["月", "火", "水", "木", "金", "土", "日"]
+game_times = ["9:00", "11:00", "13:00", "15:00", "17:00"]
+innings = 7
+
+batting_columns = [
+    "game",
+    "game_type",
+    "game_date",
+    "game_day",
+    "game_time",
+    "背番号",
+    "選手名",
+    "出場",
+    "打順",
+    "守備",
+    "打席",
+    "打数",
+    "安打",
+    "本",
+    "打点",
+    "得点",
+    "盗塁",
+    "二塁打",
+    "三塁打",
+    "三振",
+    "犠打",
+    "犠飛",
+    "併殺打",
+    "敵失",
+    "失策",
+    "四死球",
+]
+
+# 計測する条件（filtering_dfの引数）
+scenarios = {
+    "all": {},
+    "official_win": {"game_type": "公式戦", "result_type": "勝ち"},
+    "top_month": {"attack_type": "先攻", "term": "8月"},
+    "recent": {"term": "直近10試合"},
+    "point_diff": {"point_diff": "以上", "point_diff_num": 5},
+    "date_range": {
+        "term": "その他",
+        "term_1": datetime.date(2021, 4, 1),
+        "term_2": datetime.date(2022, 3, 31),
+    },
+}
+
+
+class StreamlitStub:
+    # 描画を行わずに集計処理だけを計測するための代わり
+    def columns(self, spec):
+        count = spec if isinstance(spec, int) else len(spec)
+        return [nullcontext() for _ in range(count)]
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def generate_team(rng, team_id, team, team_name, seasons, games, roster, first_year):
+    opponents = [f"{team_name}対戦{i}" for i in range(12)]
+    places = [f"{team_name}球場{i}" for i in range(8)]
+    # 背番号は1〜99（選手が100人以上の場合は選手数まで）から重複なく選ぶ
+    numbers = rng.permutation(np.arange(1, max(roster, 99) + 1))[:roster]
+    players = [f"{team}選手{i}" for i in range(roster)]
+
+    score_rows = []
+    batting_rows = []
+    pitching_rows = []
+    game_id = 0
+    for season in range(seasons):
+        year = first_year + season
+        # 1シーズンの試合数が日数を超える場合は同じ日に複数の試合を行う
+        days = rng.choice(np.arange(365), games, replace=games > 365)
+        days = np.sort(days)[::-1]
+        for day in days:
+            game_id += 1
+            game_date = pd.Timestamp(year, 1, 1) + pd.Timedelta(days=int(day))
+            game = {
+                "game": team_id * 1000000 + game_id,
+                "game_type": "公式戦" if rng.random() < 0.3 else "練習試合",
+                "game_date": game_date.strftime("%Y-%m-%d"),
+                "game_day": game_days[game_date.dayofweek],
+                "game_time": game_times[rng.integers(len(game_times))],
+            }
+            is_top = rng.random() < 0.5
+            opponent = opponents[rng.integers(len(opponents))]
+            row = {
+                **game,
+                "game_place": places[rng.integers(len(places))],
+                "team_name_top": team_name if is_top else opponent,
+                "team_name_bottom": opponent if is_top else team_name,
+            }
+            for side in ["top", "bottom"]:
+                runs = rng.poisson(0.7, innings)
+                for i in range(innings):
+                    row[f"{i + 1}_{side}"] = runs[i]
+                row[f"points_{side}"] = runs.sum()
+            score_rows.append(row)
+            batting_rows += generate_batting(rng, game, numbers, players)
+            pitching_rows += generate_pitching(rng, game, numbers, players)
+    return (
+        pd.DataFrame(score_rows),
+        pd.DataFrame(batting_rows, columns=batting_columns),
+        pd.DataFrame(pitching_rows),
+    )
+
+
+def generate_batting(rng, game, numbers, players):
+    lineup = rng.choice(len(players), min(len(players), 10), replace=False)
+    rows = []
+    for order, player in enumerate(lineup):
+        plate_appearances = int(rng.integers(2, 6))
+        walks = int(rng.binomial(plate_appearances, 0.1))
+        at_bats = plate_appearances - walks
+        hits = int(rng.binomial(at_bats, 0.25))
+        doubles = int(rng.binomial(hits, 0.2))
+        home_runs = int(rng.binomial(hits - doubles, 0.05))
+        rows.append(
+            [
+                *game.values(),
+                str(numbers[player]),
+                players[player],
+                "先発" if order < 9 else "代打",
+                str(order + 1) if order < 9 else "-",
+                position_list[order] if order < 9 else "-",
+                plate_appearances,
+                at_bats,
+                hits,
+                home_runs,
+                int(rng.binomial(hits + 1, 0.4)),
+                int(rng.binomial(hits + walks, 0.4)),
+                int(rng.binomial(hits + walks, 0.3)),
+                doubles,
+                0,
+                int(rng.binomial(at_bats - hits, 0.3)),
+                0,
+                0,
+                int(rng.binomial(at_bats - hits, 0.05)),
+                int(rng.binomial(at_bats - hits, 0.05)),
+                int(rng.binomial(1, 0.1)),
+                walks,
+            ]
+        )
+    return rows
+
+
+def generate_pitching(rng, game, numbers, players):
+    pitchers = rng.choice(len(players), int(rng.integers(1, 4)), replace=False)
+    outs = rng.multinomial(innings * 3, np.ones(len(pitchers)) / len(pitchers))
+    rows = []
+    for order, (player, out) in enumerate(zip(pitchers, outs)):
+        runs = int(rng.poisson(out / 6))
+        rows.append(
+            {
+                **game,
+                "背番号": str(numbers[player]),
+                "選手名": players[player],
+                "勝敗": ["勝", "負", "-"][rng.integers(3)] if order == 0 else "-",
+                "投球回": f"{out // 3}回{out % 3}/3",
+                "失点": runs,
+                "自責点": int(rng.binomial(runs, 0.7)),
+                "完投": "◯" if len(pitchers) == 1 else "-",
+                "完封": "◯" if len(pitchers) == 1 and runs == 0 else "-",
+                "被安打": int(rng.poisson(out / 4)),
+                "被本塁打": int(rng.binomial(3, 0.05)),
+                "奪三振": int(rng.poisson(out / 3)),
+                "ボーク": 0,
+                "暴投": int(rng.binomial(2, 0.1)),
+                "登板順": order + 1,
+                "与四死球": int(rng.poisson(out / 5)),
+            }
+        )
+    return rows
+
+
+def write_data(folder, args):
+    # 合成データをアプリと同じフォルダ構成で書き出す
+    rng = np.random.default_rng(args.seed)
+    rows = {}
+    for i in range(args.teams):
+        team = f"benchmark_{i}"
+        team_dict[team] = f"ベンチマーク{i}"
+        tables = generate_team(
+            rng,
+            i + 1,
+            team,
+            team_dict[team],
+            args.seasons,
+            args.games,
+            args.roster,
+            args.first_year,
+        )
+        os.makedirs(f"{folder}/data/{team}", exist_ok=True)
+        rows[team] = {}
+        for table, df in zip(["score", "batting", "pitching"], tables):
+            df.to_csv(f"{folder}/data/{team}/{table}.csv", index=False)
+            rows[team][table] = df.shape[0]
+    return rows
+
+
+def measure(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return {"mean_ms": float(np.mean(times)), "min_ms": float(np.min(times))}
+
+
+def get_options(scenario):
+    options = {
+        "game_type": "すべて",
+        "attack_type": "すべて",
+        "result_type": "すべて",
+        "point_diff": "すべて",
+        "term": "すべて",
+        "oppo_team": "すべて",
+        "game_place": "すべて",
+        "point_diff_num": None,
+        "term_1": None,
+        "term_2": None,
+    }
+    options.update(scenario)
+    return options
+
+
+def run_team(team, repeat):
+    results = {}
+    results["load"] = measure(
+        lambda: [normalize_dtypes(df) for df in read_team_data(team)], repeat
+    )
+    tables = [normalize_dtypes(df) for df in read_team_data(team)]
+    score_df = tables[0]
+    results["perspective"] = measure(
+        lambda: calc_team_perspective(score_df, team_dict[team]), repeat
+    )
+    pages = {}
+    for page in ["score", "batting", "pitching"]:
+        results[f"build_page_data.{page}"] = measure(
+            lambda: build_page_data(team, page, *tables), repeat
+        )
+        pages[page] = build_page_data(team, page, *tables)
+
+    batting_df, batting_index, batting_cube = pages["batting"]
+    pitching_df, pitching_index, pitching_cube = pages["pitching"]
+    for name, scenario in scenarios.items():
+        options = get_options(scenario)
+        results[f"filtering_df.{name}"] = measure(
+            lambda: filtering_df(
+                batting_df, team, **options, filter_index=batting_index
+            ),
+            repeat,
+        )
+        batting_options = {
+            **options,
+            "regulation": 0,
+            "order": "すべて",
+            "position": "すべて",
+        }
+        # 集計済みのセルを使う場合（.cube）と元の行だけで集計する場合（.rows）
+        for source, use_cube in [("cube", True), ("rows", False)]:
+            results[f"display_groupby_player.batting.{name}.{source}"] = measure(
+                lambda: display.display_groupby_player(
+                    batting_df,
+                    calc_batting_data_groupby,
+                    "batting",
+                    team,
+                    batting_options,
+                    batting_index,
+                    batting_cube if use_cube else None,
+                ),
+                repeat,
+            )
+            results[f"display_groupby_player.pitching.{name}.{source}"] = measure(
+                lambda: display.display_groupby_player(
+                    pitching_df,
+                    calc_pitching_data_groupby,
+                    "pitching",
+                    team,
+                    options,
+                    pitching_index,
+                    pitching_cube if use_cube else None,
+                ),
+                repeat,
+            )
+
+    players_df = calc_player_data(
+        batting_df,
+        calc_batting_data_groupby,
+        team,
+        {**all_options, "regulation": 0},
+        batting_index,
+        batting_cube,
+    )
+    results["color_styles.batting"] = measure(
+        lambda: display.calc_color_styles(players_df, low_better_batting), repeat
+    )
+    results["term_breakdown.batting.rows"] = measure(
+        lambda: calc_term_data(batting_df, calc_batting_data_groupby, team), repeat
+    )
+    results["term_breakdown.batting.cube"] = measure(
+        lambda: calc_term_data(batting_cube["cells"], cube_funcs["batting"], team),
+        repeat,
+    )
+    results["calc_pitching_data"] = measure(
+        lambda: calc_pitching_data(pitching_df), repeat
+    )
+    # 集計済みのセルの数（元の行数と比べてどれだけ減ったか）
+    cells = {
+        "batting": batting_cube["cells"].shape[0],
+        "pitching": pitching_cube["cells"].shape[0],
+    }
+    return results, cells
+
+
+def main(args):
+    display.st = StreamlitStub()
+    # 繰り返し計測でキャッシュされた結果が使われないよう，毎回色を計算する
+    display._load_color_styles = display.calc_color_styles
+    with tempfile.TemporaryDirectory() as folder:
+        rows = write_data(folder, args)
+        teams = list(rows)
+        # アプリと同じく data/{team}/ からの相対パスで読み込む
+        cwd = os.getcwd()
+        os.chdir(folder)
+        try:
+            results = {}
+            for team in teams:
+                results[team], rows[team]["cube_cells"] = run_team(team, args.repeat)
+        finally:
+            os.chdir(cwd)
+
+    # チームごとの平均を集計結果とする
+    timings = {
+        stage: {
+            key: float(np.mean([results[team][stage][key] for team in teams]))
+            for key in ["mean_ms", "min_ms"]
+        }
+        for stage in results[teams[0]]
+    }
+    output = {
+        "config": vars(args),
+        "environment": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+        },
+        "rows": rows,
+        "timings": timings,
+    }
+    content = json.dumps(output, ensure_ascii=False, indent=1)
+    if args.output is None:
+        print(content)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(content)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    # 合成データの規模（チーム数・シーズン数・1シーズンの試合数・選手数）
+    parser.add_argument("--teams", type=int, default=2)
+    parser.add_argument("--seasons", type=int, default=5)
+    parser.add_argument("--games", type=int, default=40)
+    parser.add_argument("--roster", type=int, default=20)
+    parser.add_argument("--first-year", type=int, default=2020)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    # 結果を書き出すjsonファイル（指定しない場合は標準出力）
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args()
+    main(args)
@@ -1,65 +1,420 @@
+import numpy as np
+import pandas as pd
 from lib.info import teams_url
 
 
-def get_opponent_team(row, team):
-    if row["team_name_top"] == team:
-        return row["team_name_bottom"]
-    else:
-        return row["team_name_top"]
-
-
-def win_or_lose(row, team):
-    if row["team_name_top"] == team:
-        if row["points_top"] > row["points_bottom"]:
-            return "○"
-        elif row["points_top"] < row["points_bottom"]:
-            return "☓"
-        else:
-            return "△"
-    else:
-        if row["points_top"] < row["points_bottom"]:
-            return "○"
-        elif row["points_top"] > row["points_bottom"]:
-            return "☓"
-        else:
-            return "△"
-
-
-def calc_points_diff(row, team):
-    if row["team_name_top"] == team:
-        return row["points_top"] - row["points_bottom"]
-    else:
-        return row["points_bottom"] - row["points_top"]
-
-
-def calc_points_losts(row, team):
-    if row["team_name_top"] == team:
-        return row["points_top"], row["points_bottom"]
-    else:
-        return row["points_bottom"], row["points_top"]
-
-
-def calc_inning_points(row, team):
-    tmp_row = row.copy()
-    if tmp_row["team_name_top"] == team:
-        for i in range(1, 10):
-            tmp_row.rename({f"{i}_top": f"{i}_points"}, inplace=True)
-    else:
-        for i in range(1, 10):
-            tmp_row.rename({f"{i}_bottom": f"{i}_points"}, inplace=True)
-    return tmp_row[[f"{i}_points" for i in range(1, 10)]]
-
-
-def calc_inning_losts(row, team):
-    tmp_row = row.copy()
-    if row["team_name_top"] == team:
-        for i in range(1, 10):
-            tmp_row.rename({f"{i}_bottom": f"{i}_losts"}, inplace=True)
-    else:
-        for i in range(1, 10):
-            tmp_row.rename({f"{i}_top": f"{i}_losts"}, inplace=True)
-    return tmp_row[[f"{i}_losts" for i in range(1, 10)]]
-
-
-def get_teams_url(game, team):
-    return f"{teams_url}{team}/game/{game}"
+def calc_team_perspective(score_df, team):
+    # 先攻・後攻のどちらかを列ごとに選択して自チーム視点に変換する
+    is_top = (score_df["team_name_top"] == team).to_numpy()
+    points_top = score_df["points_top"].to_numpy()
+    points_bottom = score_df["points_bottom"].to_numpy()
+
+    points = np.where(is_top, points_top, points_bottom)
+    losts = np.where(is_top, points_bottom, points_top)
+    oppo_team = np.where(
+        is_top,
+        score_df["team_name_bottom"].to_numpy(),
+        score_df["team_name_top"].to_numpy(),
+    )
+    result = np.select([points > losts, points < losts], ["○", "☓"], default="△")
+    return pd.DataFrame(
+        {
+            "oppo_team": oppo_team,
+            "result": result.astype(object),
+            "points": points,
+            "losts": losts,
+            "points_diff": points - losts,
+        },
+        index=score_df.index,
+    )
+
+
+def get_innings(df, suffix="top"):
+    # 延長戦にも対応できるように列名からイニングを取得する
+    innings = []
+    for column in df.columns:
+        inning, _, column_suffix = str(column).partition("_")
+        if column_suffix == suffix and inning.isdigit():
+            innings.append(int(inning))
+    return sorted(innings)
+
+
+def calc_inning_points_losts(score_df, team):
+    innings = get_innings(score_df)
+    is_top = (score_df["team_name_top"] == team).to_numpy()[:, np.newaxis]
+    top = score_df[[f"{i}_top" for i in innings]].to_numpy(dtype=float, na_value=np.nan)
+    bottom = score_df[[f"{i}_bottom" for i in innings]].to_numpy(
+        dtype=float, na_value=np.nan
+    )
+
+    points = np.where(is_top, top, bottom)
+    losts = np.where(is_top, bottom, top)
+    return pd.concat(
+        [
+            pd.DataFrame(
+                points,
+                index=score_df.index,
+                columns=[f"{i}_points" for i in innings],
+            ),
+            pd.DataFrame(
+                losts,
+                index=score_df.index,
+                columns=[f"{i}_losts" for i in innings],
+            ),
+        ],
+        axis=1,
+    )
+
+
+def get_teams_url(games, team):
+    return f"{teams_url}{team}/game/" + games.astype(str)
+
+
+batting_count_columns = [
+    "打席",
+    "打数",
+    "安打",
+    "二塁打",
+    "三塁打",
+    "本",
+    "打点",
+    "得点",
+    "盗塁",
+    "三振",
+    "四死球",
+    "犠打",
+    "犠飛",
+    "併殺打",
+    "敵失",
+    "失策",
+]
+
+
+def get_result_column(df):
+    return "result" if "result" in df.columns else "結果"
+
+
+def get_group_keys(df, by):
+    if isinstance(by, str):
+        return df[by]
+    elif isinstance(by, list):
+        return [df[key] if isinstance(key, str) else key for key in by]
+    return by
+
+
+def sum_counts(counts, keys, dropna=True):
+    sums = counts.groupby(keys, observed=True, dropna=dropna).sum()
+    # 欠損値を含む整数型（Int8など）は合計後に通常の整数型に戻す
+    return sums.astype(
+        {
+            column: "int64"
+            for column, dtype in sums.dtypes.items()
+            if isinstance(dtype, pd.api.extensions.ExtensionDtype)
+        }
+    )
+
+
+def calc_win_rate_vector(win, lose):
+    return (win / (win + lose)).where(win + lose != 0, 0)
+
+
+def clip_speed_score(score):
+    # 0以下（計算不能を含む）は0に、10以上は10に変換
+    return score.fillna(0).clip(0, 10)
+
+
+def get_batting_counts(df):
+    result = df[get_result_column(df)]
+    return df[batting_count_columns].assign(
+        試合数=1,
+        勝ち=result == "○",
+        負け=result == "☓",
+        引き分け=result == "△",
+        非DH=df["守備"] != "DH",
+        先発守備=(df["出場"] == "先発") & ~df["守備"].isin(["-", "DH"]),
+    )
+
+
+def sum_batting_counts(df, by):
+    counts = get_batting_counts(df)
+    keys = get_group_keys(df, by)
+    sums = sum_counts(counts, keys)
+    sums.insert(0, "背番号", df["背番号"].groupby(keys, observed=True).first())
+    return sums
+
+
+def calc_batting_rates(sums):
+    hits = sums["安打"]
+    doubles = sums["二塁打"]
+    triples = sums["三塁打"]
+    home_runs = sums["本"]
+    at_bats = sums["打数"]
+    plate_appearances = sums["打席"]
+    walks = sums["四死球"]
+    strikeouts = sums["三振"]
+    sacrifice_flies = sums["犠飛"]
+    stolen_bases = sums["盗塁"]
+
+    total_bases = hits + doubles + triples * 2 + home_runs * 3
+    on_base_percentage = (hits + walks) / (at_bats + walks + sacrifice_flies)
+    slugging_percentage = total_bases / at_bats
+    average = hits / at_bats
+    bb_k = (walks / strikeouts).where(strikeouts != 0, 99.999)
+    one_base_hit = hits - doubles - triples - home_runs
+    woba_basic = (
+        0.7 * walks
+        + 0.9 * (one_base_hit + sums["敵失"])
+        + 1.3 * (doubles + triples)
+        + 2.0 * home_runs
+    ) / (plate_appearances - sums["犠打"])
+    babib = (hits - home_runs) / (at_bats + sacrifice_flies - strikeouts - home_runs)
+
+    # 盗塁成功率
+    success_rate = (((stolen_bases + 3) / (stolen_bases + 7) - 0.4) * 20).where(
+        stolen_bases != 0, 0
+    )
+    # 盗塁企図
+    attempt = (np.sqrt(stolen_bases / (one_base_hit + walks)) / 0.07).where(
+        stolen_bases != 0, 0
+    )
+    # 三塁打割合
+    triples_rate = triples / (at_bats - home_runs - strikeouts) / 0.02 * 10
+    # 得点割合
+    runs_rate = ((sums["得点"] - home_runs) / (hits + walks - home_runs) - 0.1) / 0.04
+    speed_score = (
+        clip_speed_score(attempt)
+        + clip_speed_score(success_rate)
+        + clip_speed_score(triples_rate)
+        + clip_speed_score(runs_rate)
+    ) / 4
+    seca = (total_bases - hits + walks + stolen_bases) / at_bats
+    error_rate = (sums["失策"] / sums["先発守備"]).where(sums["非DH"] != 0)
+
+    return pd.DataFrame(
+        {
+            "背番号": sums["背番号"],
+            "試合数": sums["試合数"],
+            "勝ち": sums["勝ち"],
+            "負け": sums["負け"],
+            "引き分け": sums["引き分け"],
+            "勝率": calc_win_rate_vector(sums["勝ち"], sums["負け"]),
+            "打率": average,
+            "打席": plate_appearances,
+            "打数": at_bats,
+            "安打": hits,
+            "二塁打": doubles,
+            "三塁打": triples,
+            "本塁打": home_runs,
+            "打点": sums["打点"],
+            "得点": sums["得点"],
+            "盗塁": stolen_bases,
+            "出塁率": on_base_percentage,
+            "塁打数": total_bases,
+            "長打率": slugging_percentage,
+            "OPS": on_base_percentage + slugging_percentage,
+            "IsoP": slugging_percentage - average,  # 純長打率
+            "IsoD": on_base_percentage - average,
+            "BABIP": babib,
+            "wOBA": woba_basic,
+            "SecA": seca,
+            "三振": strikeouts,
+            "K%": strikeouts / plate_appearances,
+            "四死球": walks,
+            "BB%": walks / plate_appearances,
+            "BB/K": bb_k,
+            "Spd": speed_score,
+            "犠打": sums["犠打"],
+            "犠飛": sacrifice_flies,
+            "併殺打": sums["併殺打"],
+            "敵失": sums["敵失"],
+            "失策": sums["失策"],
+            "失策率": error_rate,
+        },
+        index=sums.index,
+    )
+
+
+def calc_batting_data_groupby(df, by):
+    return calc_batting_rates(sum_batting_counts(df, by))
+
+
+pitching_count_columns = [
+    "投球アウト数",
+    "失点",
+    "自責点",
+    "被安打",
+    "被本塁打",
+    "奪三振",
+    "与四死球",
+    "ボーク",
+    "暴投",
+]
+
+
+def calc_outs(innings):
+    # "6回1/3" のような投球回をアウト数に変換する
+    parts = innings.str.extract(r"(\d+)回(\d+)/3").astype(float)
+    outs = parts[0] * 3 + parts[1]
+    return outs.fillna(0).astype(int)
+
+
+def get_pitching_counts(df):
+    return df[pitching_count_columns].assign(
+        試合数=1,
+        勝=df["勝敗"] == "勝",
+        負=df["勝敗"] == "負",
+        完投=df["完投"] == "◯",
+        完封=df["完封"] == "◯",
+    )
+
+
+def sum_pitching_counts(df, by):
+    counts = get_pitching_counts(df)
+    keys = get_group_keys(df, by)
+    sums = sum_counts(counts, keys)
+    sums.insert(0, "背番号", df["背番号"].groupby(keys, observed=True).first())
+    return sums
+
+
+def calc_pitching_rates(sums):
+    outs = sums["投球アウト数"]
+    earned_runs = sums["自責点"]
+    hits = sums["被安打"]
+    walks = sums["与四死球"]
+    strikeouts = sums["奪三振"]
+
+    sum_inning = outs / 3
+    no_inning = outs == 0
+    # 7回で1試合
+    diffence_rate = (earned_runs / sum_inning * 7).where(~no_inning, 99.999)
+    whip = ((hits + walks) / sum_inning).where(~no_inning, 9.999)
+    k9 = (strikeouts / sum_inning * 9).where(~no_inning, 0)
+    bb9 = (walks / sum_inning * 9).where(~no_inning, 9.999)
+    # 与四死球が0の場合は奪三振の有無で決める
+    kbb = (strikeouts / walks).where(walks != 0, 0)
+    kbb = kbb.where((walks != 0) | (strikeouts == 0), 9.999)
+    kbb = kbb.where(~no_inning, 0)
+    sum_inning_str = [
+        (f"{out // 3}回", f"{out % 3}/3") for out in outs.to_numpy(dtype=int)
+    ]
+    lob = (hits + walks - sums["失点"]) / (hits + walks - 1.4 * sums["被本塁打"])
+
+    return pd.DataFrame(
+        {
+            "背番号": sums["背番号"],
+            "試合数": sums["試合数"],
+            "勝": sums["勝"],
+            "負": sums["負"],
+            "勝率": calc_win_rate_vector(sums["勝"], sums["負"]),
+            "防御率": diffence_rate,
+            "投球回": pd.Series(sum_inning_str, index=sums.index, dtype=object),
+            "失点": sums["失点"],
+            "自責点": earned_runs,
+            "完投": sums["完投"],
+            "完封": sums["完封"],
+            "被安打": hits,
+            "被本塁打": sums["被本塁打"],
+            "奪三振": strikeouts,
+            "K/9": k9,
+            "与四死球": walks,
+            "BB/9": bb9,
+            "K/BB": kbb,
+            "ボーク": sums["ボーク"],
+            "暴投": sums["暴投"],
+            "WHIP": whip,
+            "LOB%": lob,
+        },
+        index=sums.index,
+    )
+
+
+def calc_pitching_data_groupby(df, by):
+    return calc_pitching_rates(sum_pitching_counts(df, by))
+
+
+def calc_score_data_groupby(df, by):
+    keys = get_group_keys(df, by)
+    result = df["result"]
+    counts = (
+        pd.DataFrame(
+            {"勝ち": result == "○", "負け": result == "☓", "引き分け": result == "△"}
+        )
+        .groupby(keys, observed=True)
+        .sum()
+    )
+    points = df[["points", "losts", "points_diff"]].groupby(keys, observed=True)
+    sums = points.sum()
+    means = points.mean()
+    return pd.DataFrame(
+        {
+            "勝ち": counts["勝ち"],
+            "負け": counts["負け"],
+            "引き分け": counts["引き分け"],
+            "勝率": calc_win_rate_vector(counts["勝ち"], counts["負け"]),
+            "合計得点": sums["points"],
+            "合計失点": sums["losts"],
+            "合計得失点差": sums["points_diff"],
+            "1試合平均得点": means["points"],
+            "1試合平均失点": means["losts"],
+            "1試合平均得失点差": means["points_diff"],
+        },
+        index=counts.index,
+    )
+
+
+def calc_inning_mean_groupby(df, by, suffix):
+    innings = get_innings(df, suffix)
+    means = (
+        df[[f"{i}_{suffix}" for i in innings]]
+        .groupby(get_group_keys(df, by), observed=True)
+        .mean()
+    )
+    means.columns = [f"{i}回" for i in innings]
+    return means
+
+
+def calc_inning_points_mean_groupby(df, by):
+    return calc_inning_mean_groupby(df, by, "points")
+
+
+def calc_inning_losts_mean_groupby(df, by):
+    return calc_inning_mean_groupby(df, by, "losts")
+
+
+def calc_total(df, func):
+    # 全体を1グループとして集計する（データがない場合はIndexError）
+    return func(df, np.zeros(df.shape[0], dtype=int)).iloc[[0]]
+
+
+def calc_rolling_sums(counts, keys, dates, window):
+    # グループ・日付順に並べた累積和の差から，各試合までの直近window試合の合計を求める
+    order = np.lexsort((np.arange(len(dates)), dates, keys))
+    values = counts.to_numpy(dtype=float, na_value=0)[order]
+    cumsum = np.vstack([np.zeros((1, values.shape[1])), values.cumsum(axis=0)])
+    sorted_keys = keys[order]
+    is_start = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+    # 各行が属するグループの先頭の位置
+    starts = np.maximum.accumulate(np.where(is_start, np.arange(len(order)), 0))
+    positions = np.arange(len(order))
+    lower = np.maximum(positions + 1 - window, starts)
+    sums = cumsum[positions + 1] - cumsum[lower]
+    return order, pd.DataFrame(sums, columns=counts.columns)
+
+
+def calc_rolling_rates(df, get_counts, calc_rates, window, by="選手名"):
+    keys = pd.factorize(df[by])[0]
+    dates = df["game_date"].to_numpy()
+    order, sums = calc_rolling_sums(get_counts(df), keys, dates, window)
+    sums.insert(0, "背番号", df["背番号"].to_numpy()[order])
+    rates = calc_rates(sums)
+    rates.insert(0, by, df[by].to_numpy()[order])
+    rates.insert(1, "game_date", dates[order])
+    return rates.reset_index(drop=True)
+
+
+def calc_batting_rolling(df, window, by="選手名"):
+    return calc_rolling_rates(df, get_batting_counts, calc_batting_rates, window, by)
+
+
+def calc_pitching_rolling(df, window, by="選手名"):
+    return calc_rolling_rates(df, get_pitching_counts, calc_pitching_rates, window, by)
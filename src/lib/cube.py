@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+from lib.calculate import (
+    calc_batting_rates,
+    calc_pitching_rates,
+    get_batting_counts,
+    get_group_keys,
+    get_pitching_counts,
+    sum_counts,
+)
+from lib.date_sums import build_date_sums
+from lib.filtering import build_value_masks, index_columns, recent_terms
+from lib.info import team_dict
+
+# 対戦相手・球場・打順・守備まで含めると1試合1セルに近くなり集計が減らないため，
+# セルは選手・試合種別・先攻後攻・勝敗・年・月の単位とする
+cube_columns = [
+    "選手名",
+    "game_type",
+    "attack_type",
+    "result",
+    "year",
+    "month",
+]
+
+# セルに含まれない条件（指定された場合は元の行で絞り込む）
+raw_options = ["oppo_team", "game_place", "order", "position"]
+
+cube_counts = {
+    "batting": get_batting_counts,
+    "pitching": get_pitching_counts,
+}
+
+
+def get_cube_keys(df, team):
+    is_top = (df["team_name_top"] == team_dict[team]).to_numpy()
+    keys = {
+        "attack_type": np.where(is_top, "先攻", "後攻"),
+        "year": df["game_date"].dt.year,
+        "month": df["game_date"].dt.month,
+    }
+    columns = [
+        column for column in cube_columns if column in df.columns or column in keys
+    ]
+    # 背番号もキーに含め，セル内の行がすべて同じ背番号になるようにする
+    return pd.DataFrame(
+        {column: keys.get(column, df.get(column)) for column in columns + ["背番号"]},
+        index=df.index,
+    )
+
+
+def build_cube(df, team, page):
+    # 条件の組み合わせごとにカウント系の列を合計したセルを読み込み時に一度だけ作成する
+    keys = get_cube_keys(df, team)
+    groups = [keys[column] for column in keys.columns]
+    counts = cube_counts[page](df)
+    cells = sum_counts(counts, groups, dropna=False)
+    # セルに含まれる最初の行の位置（元の行の順番を再現するために使う）
+    position = pd.Series(np.arange(df.shape[0]), index=df.index)
+    cells["position"] = position.groupby(groups, observed=True, dropna=False).min()
+    cells = cells.reset_index().sort_values("position", ignore_index=True)
+    return {
+        "page": page,
+        "cells": cells,
+        "filter_index": build_cube_index(cells),
+        "date_sums": build_date_sums(df, counts, page),
+    }
+
+
+def build_cube_index(cells):
+    filter_index = {"size": cells.shape[0]}
+    for column in index_columns + ["year", "month", "attack_type"]:
+        if column in cells.columns:
+            filter_index[column] = build_value_masks(cells[column])
+    return filter_index
+
+
+def is_cube_supported(selected_options):
+    # 点差・直近の試合・任意の期間は試合ごとの値が必要なため元の行で絞り込む
+    term = selected_options["term"]
+    return (
+        selected_options["point_diff"] == "すべて"
+        and term not in recent_terms
+        and term != "その他"
+        and all(
+            selected_options.get(option) in [None, "すべて"] for option in raw_options
+        )
+    )
+
+
+def sum_cube_counts(cells, by):
+    keys = get_group_keys(cells, by)
+    columns = [
+        column
+        for column in cells.columns
+        if column not in cube_columns + ["背番号", "position"]
+    ]
+    sums = sum_counts(cells[columns], keys)
+    # セルは最初の行の位置順に並んでいるため，元の行と同じ背番号が得られる
+    sums.insert(0, "背番号", cells["背番号"].groupby(keys, observed=True).first())
+    return sums
+
+
+def calc_cube_batting_data_groupby(cells, by):
+    return calc_batting_rates(sum_cube_counts(cells, by))
+
+
+def calc_cube_pitching_data_groupby(cells, by):
+    return calc_pitching_rates(sum_cube_counts(cells, by))
+
+
+cube_funcs = {
+    "batting": calc_cube_batting_data_groupby,
+    "pitching": calc_cube_pitching_data_groupby,
+}
+
+
+def select_source(df, func, filter_index, cube, selected_options):
+    # 集計済みのセルで解決できる条件ならセルを，そうでなければ元の行を使う
+    if cube is None or not is_cube_supported(selected_options):
+        return df, func, filter_index
+    return cube["cells"], cube_funcs[cube["page"]], cube["filter_index"]
@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+from lib.calculate import calc_batting_rates, calc_pitching_rates, sum_counts
+from lib.filtering import search_date_range, to_days
+
+rates_funcs = {
+    "batting": calc_batting_rates,
+    "pitching": calc_pitching_rates,
+}
+
+
+def calc_cumsum(values):
+    # 先頭に0の行を加え，範囲の合計を累積和の差で求められるようにする
+    return np.vstack(
+        [np.zeros((1, values.shape[1]), dtype=np.int64), values.cumsum(axis=0)]
+    )
+
+
+def build_date_sums(df, counts, page):
+    # 選手・背番号ごとと，チーム全体で日付順に並べたカウント系の列の累積和
+    segments = df.groupby(["選手名", "背番号"], observed=True, dropna=False, sort=False)
+    codes = segments.ngroup().to_numpy()
+    days = to_days(df["game_date"].to_numpy())
+    position = np.arange(df.shape[0])
+    # 元の行は新しい試合から並んでいるため，同じ日の試合は元の行の順番の逆に並べ，
+    # 期間内の最後の行が元の行で最初に現れる行になるようにする
+    order = np.lexsort((-position, days, codes))
+    first_day = days.min() if df.shape[0] > 0 else 0
+    span = days.max() - first_day + 1 if df.shape[0] > 0 else 1
+    values = counts.to_numpy(dtype=np.int64, na_value=0)
+    first_rows = segments.head(1)
+    return {
+        "page": page,
+        "columns": counts.columns,
+        # 選手・背番号と日付を1つの整数にまとめ，二分探索で範囲を求める
+        "keys": codes[order] * span + (days[order] - first_day),
+        "cumsum": calc_cumsum(values[order]),
+        "position": position[order],
+        "first_day": first_day,
+        "span": span,
+        "players": first_rows["選手名"].reset_index(drop=True),
+        "numbers": first_rows["背番号"].to_numpy(),
+        "team": build_team_sums(df, values, days, position),
+    }
+
+
+def build_team_sums(df, values, days, position):
+    order = np.lexsort((-position, days))
+    # 背番号は欠損していない行の中で最初に現れるものを使う
+    numbers = df["背番号"].to_numpy()
+    has_number = ~pd.isna(numbers[order])
+    return {
+        "days": days[order],
+        "cumsum": calc_cumsum(values[order]),
+        "position": position[order],
+        "number_days": days[order][has_number],
+        "number_position": position[order][has_number],
+        "numbers": numbers[order][has_number],
+    }
+
+
+def sum_date_range(date_sums, selected_date1, selected_date2):
+    # 期間の両端を二分探索し，累積和の差から選手ごとの合計を求める
+    segments = np.arange(len(date_sums["numbers"]))
+    span = date_sums["span"]
+    start, end = to_days([selected_date1, selected_date2]) - date_sums["first_day"]
+    keys = date_sums["keys"]
+    lower, upper = search_date_range(
+        keys,
+        segments * span + np.clip(start, 0, span),
+        segments * span + np.clip(end, -1, span - 1),
+    )
+    cumsum = date_sums["cumsum"]
+    sums = pd.DataFrame(cumsum[upper] - cumsum[lower], columns=date_sums["columns"])
+    selected = upper > lower
+    sums = sums[selected]
+    # 期間内で最初に現れる行の背番号を選手の背番号とする
+    first = date_sums["position"][upper[selected] - 1]
+    players = date_sums["players"][selected]
+    numbers = pd.Series(date_sums["numbers"][selected], index=sums.index)
+    numbers = numbers.iloc[np.argsort(first, kind="stable")]
+    result = sum_counts(sums, players)
+    result.insert(0, "背番号", numbers.groupby(players, observed=True).first())
+    return result
+
+
+def sum_month_ranges(team_sums, selected_date1, selected_date2):
+    # 期間を月ごとに区切り，月の境界の二分探索と累積和の差で合計を求める
+    months = np.arange(
+        np.datetime64(selected_date1, "M"), np.datetime64(selected_date2, "M") + 1
+    )
+    bounds = to_days(np.append(months, months[-1] + 1))
+    start, end = to_days([selected_date1, selected_date2])
+    starts = np.maximum(bounds[:-1], start)
+    ends = np.minimum(bounds[1:] - 1, end)
+    lower, upper = search_date_range(team_sums["days"], starts, ends)
+    cumsum = team_sums["cumsum"]
+    # 月ごとに期間内で最初に現れる行の位置と，背番号のある最初の行
+    first = np.where(upper > lower, team_sums["position"][upper - 1], -1)
+    number_lower, number_upper = search_date_range(
+        team_sums["number_days"], starts, ends
+    )
+    # 背番号のある行がない場合は末尾に欠損値を加えて参照する
+    number_position = np.append(team_sums["number_position"], -1)
+    numbers = np.append(team_sums["numbers"].astype(object), None)
+    number_index = np.where(number_upper > number_lower, number_upper - 1, -1)
+    return pd.DataFrame(
+        {
+            "year": months.astype("datetime64[Y]").astype(int) + 1970,
+            "month": months.astype(int) % 12 + 1,
+            "first": first,
+            "number_first": number_position[number_index],
+            "number": numbers[number_index],
+        }
+    ), pd.DataFrame(cumsum[upper] - cumsum[lower])
+
+
+def group_month_sums(months, sums, keys):
+    # 月ごとの合計をkeysでまとめ，最初に現れる行の背番号を付ける
+    result = sums.groupby(keys, sort=False).sum()
+    has_number = months["number_first"] >= 0
+    numbers = months[has_number].sort_values("number_first")
+    numbers = numbers.groupby(keys[has_number], sort=False)["number"].first()
+    result.insert(0, "背番号", numbers.reindex(result.index).infer_objects())
+    return result
+
+
+def calc_date_range_term_data(date_sums, selected_date1, selected_date2):
+    # チーム全体の期間別の成績（calc_term_dataと同じ表）を累積和の差から求める
+    team_sums = date_sums["team"]
+    start, end = to_days([selected_date1, selected_date2])
+    lower, upper = search_date_range(team_sums["days"], start, end)
+    if upper <= lower:
+        raise IndexError("no rows in the date range")
+    months, sums = sum_month_ranges(team_sums, selected_date1, selected_date2)
+    sums.columns = date_sums["columns"]
+    selected = (months["first"] >= 0).to_numpy()
+    months, sums = months[selected], sums[selected]
+    # 年は期間内で最初に現れる順，月は昇順に並べる
+    months = months.sort_values("first", kind="stable")
+    sums = sums.loc[months.index]
+    total = group_month_sums(months, sums, pd.Series(0, index=months.index))
+    years = group_month_sums(months, sums, months["year"])
+    by_month = group_month_sums(months, sums, months["month"]).sort_index()
+    sums = pd.concat([total, years, by_month], ignore_index=True)
+    result = rates_funcs[date_sums["page"]](sums)
+    result.index = (
+        ["すべて"]
+        + [f"{year}年" for year in years.index]
+        + [f"{month}月" for month in by_month.index]
+    )
+    return result
+
+
+def is_date_sums_supported(selected_options):
+    # 任意の期間以外の条件がない場合は累積和の差で成績を求める
+    options = ["game_type", "attack_type", "result_type", "point_diff"]
+    options += ["oppo_team", "game_place", "order", "position"]
+    return selected_options["term"] == "その他" and all(
+        selected_options.get(option, "すべて") == "すべて" for option in options
+    )
+
+
+def calc_date_range_data(date_sums, selected_date1, selected_date2):
+    sums = sum_date_range(date_sums, selected_date1, selected_date2)
+    return rates_funcs[date_sums["page"]](sums)
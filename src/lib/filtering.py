@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+from lib.info import team_dict
+from lib.profiling import profiled
+
+result_marks = {
+    "勝ち": "○",
+    "負け": "☓",
+    "引き分け": "△",
+}
+
+recent_terms = {
+    "直近5試合": 5,
+    "直近10試合": 10,
+}
+
+index_columns = ["game_type", "result", "oppo_team", "game_place", "打順", "守備"]
+
+
+def build_value_masks(values):
+    # カテゴリ型の場合は整数コードをそのまま使う
+    codes, uniques = pd.factorize(values)
+    return {value: codes == i for i, value in enumerate(uniques)}
+
+
+def build_filter_index(df, team):
+    # データセットごとに一度だけ作成し，フィルタはマスクのANDで解決する
+    filter_index = {"size": df.shape[0]}
+    for column in index_columns:
+        if column in df.columns:
+            filter_index[column] = build_value_masks(df[column])
+    filter_index["year"] = build_value_masks(df["game_date"].dt.year)
+    filter_index["month"] = build_value_masks(df["game_date"].dt.month)
+    is_top = (df["team_name_top"] == team_dict[team]).to_numpy()
+    filter_index["attack_type"] = {"先攻": is_top, "後攻": ~is_top}
+    filter_index["game_date"] = build_date_index(df["game_date"])
+    return filter_index
+
+
+def to_days(dates):
+    # 日単位の整数にして比較する
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+def build_date_index(game_date):
+    # 日付順に並べた行の位置（任意の期間は二分探索で連続した範囲として取り出す）
+    days = to_days(game_date.to_numpy())
+    order = np.argsort(days, kind="stable")
+    return {"order": order, "days": days[order]}
+
+
+def search_date_range(days, start, end):
+    lower = np.searchsorted(days, start, side="left")
+    upper = np.searchsorted(days, end, side="right")
+    return lower, np.maximum(lower, upper)
+
+
+def calc_mask(df, team, key, value):
+    if key == "attack_type":
+        is_top = (df["team_name_top"] == team_dict[team]).to_numpy()
+        return is_top if value == "先攻" else ~is_top
+    elif key == "year":
+        return (df["game_date"].dt.year == value).to_numpy()
+    elif key == "month":
+        return (df["game_date"].dt.month == value).to_numpy()
+    return calc_equal_mask(df[key], value)
+
+
+def calc_equal_mask(values, value):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # カテゴリ型は整数コードで比較する
+        if value not in values.cat.categories:
+            return np.zeros(values.shape[0], dtype=bool)
+        return values.cat.codes.to_numpy() == values.cat.categories.get_loc(value)
+    return (values == value).to_numpy()
+
+
+def get_mask(df, team, filter_index, key, value):
+    if filter_index is None:
+        return calc_mask(df, team, key, value)
+    mask = filter_index[key].get(value)
+    if mask is None:
+        return np.zeros(df.shape[0], dtype=bool)
+    return mask
+
+
+@profiled
+def filtering_df(
+    df,
+    team,
+    game_type="すべて",
+    attack_type="すべて",
+    result_type="すべて",
+    point_diff="すべて",
+    term="すべて",
+    oppo_team="すべて",
+    game_place="すべて",
+    point_diff_num=None,
+    term_1=None,
+    term_2=None,
+    order=None,
+    position=None,
+    groupby=None,
+    filter_index=None,
+):
+    if filter_index is not None and filter_index["size"] != df.shape[0]:
+        raise ValueError("filter_index does not match the dataframe")
+
+    selected = np.ones(df.shape[0], dtype=bool)
+    if game_type != "すべて":
+        selected &= get_mask(df, team, filter_index, "game_type", game_type)
+    if attack_type != "すべて":
+        selected &= get_mask(df, team, filter_index, "attack_type", attack_type)
+    if result_type != "すべて":
+        result = result_marks[result_type]
+        selected &= get_mask(df, team, filter_index, "result", result)
+
+    if point_diff == "以上":
+        selected &= np.abs(df["points_diff"].to_numpy()) >= point_diff_num
+    elif point_diff == "以下":
+        selected &= np.abs(df["points_diff"].to_numpy()) <= point_diff_num
+
+    positions = None
+    if term == "すべて":
+        pass
+    elif term == "その他":
+        selected &= calc_calendar_mask(df, term_1, term_2, filter_index)
+    elif term in recent_terms:
+        # 直近の試合は以降の条件より先に絞り込む
+        positions = filtering_recent(
+            df, np.flatnonzero(selected), recent_terms[term], groupby
+        )
+    else:
+        term = int(term.replace("年", "").replace("月", ""))
+        if term > 2000:
+            selected &= get_mask(df, team, filter_index, "year", term)
+        elif term >= 1 and term <= 12:
+            selected &= get_mask(df, team, filter_index, "month", term)
+
+    post_selected = np.ones(df.shape[0], dtype=bool)
+    if oppo_team != "すべて":
+        post_selected &= get_mask(df, team, filter_index, "oppo_team", oppo_team)
+    if game_place != "すべて":
+        post_selected &= get_mask(df, team, filter_index, "game_place", game_place)
+    if order != "すべて" and order is not None:
+        order = order.replace("番", "")
+        post_selected &= get_mask(df, team, filter_index, "打順", order)
+    if position != "すべて" and position is not None:
+        post_selected &= get_mask(df, team, filter_index, "守備", position)
+
+    if positions is None:
+        positions = np.flatnonzero(selected & post_selected)
+    else:
+        positions = positions[post_selected[positions]]
+    return df.take(positions)
+
+
+def filtering_recent(df, positions, num, groupby=None):
+    game_date = df["game_date"].iloc[positions].reset_index(drop=True)
+    if groupby is None:
+        order = game_date.sort_values(ascending=False).index[:num]
+        return positions[order]
+    # グループ（選手）ごとに直近の試合を取り出す
+    order = game_date.sort_values(ascending=False, kind="stable").index
+    positions = positions[order]
+    keys = pd.Series(df[groupby].to_numpy()[positions])
+    return positions[(keys.groupby(keys, dropna=False).cumcount() < num).to_numpy()]
+
+
+def calc_calendar_mask(df, selected_date1, selected_date2, filter_index=None):
+    if filter_index is not None and "game_date" in filter_index:
+        date_index = filter_index["game_date"]
+        start, end = to_days([selected_date1, selected_date2])
+        lower, upper = search_date_range(date_index["days"], start, end)
+        mask = np.zeros(df.shape[0], dtype=bool)
+        mask[date_index["order"][lower:upper]] = True
+        return mask
+    game_date = df["game_date"].dt.normalize()
+    return (
+        (game_date >= pd.Timestamp(selected_date1))
+        & (game_date <= pd.Timestamp(selected_date2))
+    ).to_numpy()
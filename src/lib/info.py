@@ -4,6 +4,61 @@ team_dict = {
     "ryunen_busters": "留年バスターズ",
 }
 
+# 読み込む列（Noneの場合はすべての列）
+load_columns = {
+    "score": None,
+    "batting": [
+        "game",
+        "game_type",
+        "game_date",
+        "game_day",
+        "game_time",
+        "背番号",
+        "選手名",
+        "出場",
+        "打順",
+        "守備",
+        "打席",
+        "打数",
+        "安打",
+        "本",
+        "打点",
+        "得点",
+        "盗塁",
+        "二塁打",
+        "三塁打",
+        "三振",
+        "犠打",
+        "犠飛",
+        "併殺打",
+        "敵失",
+        "失策",
+        "四死球",
+    ],
+    "pitching": [
+        "game",
+        "game_type",
+        "game_date",
+        "game_day",
+        "game_time",
+        "背番号",
+        "選手名",
+        "勝敗",
+        "投球回",
+        "失点",
+        "自責点",
+        "完投",
+        "完封",
+        "被安打",
+        "被本塁打",
+        "奪三振",
+        "ボーク",
+        "暴投",
+        "登板順",
+        "与四死球",
+    ],
+}
+
 column_name = {
     "game": "ID",
     "game_url": "詳細",
@@ -202,6 +257,41 @@ position_list = [
     "DH",
 ]
 
+# チーム比較で表示する列
+comparison_columns = {
+    "score": ["勝ち", "負け", "引き分け", "勝率", "1試合平均得点", "1試合平均失点"],
+    "batting": ["打率", "出塁率", "長打率", "OPS", "本塁打", "盗塁"],
+    "pitching": ["防御率", "WHIP", "K/9", "BB/9"],
+}
+
+comparison_format = {
+    "勝率": "{:.3f}",
+    "1試合平均得点": "{:.2f}",
+    "1試合平均失点": "{:.2f}",
+    "打率": "{:.3f}",
+    "出塁率": "{:.3f}",
+    "長打率": "{:.3f}",
+    "OPS": "{:.3f}",
+    "防御率": "{:.3f}",
+    "WHIP": "{:.3f}",
+    "K/9": "{:.3f}",
+    "BB/9": "{:.3f}",
+}
+
+low_better_comparison = [
+    "負け",
+    "1試合平均失点",
+    "防御率",
+    "WHIP",
+    "BB/9",
+]
+
+# 個人成績で直近の推移を表示する列
+rolling_columns = {
+    "batting": ["打率", "出塁率", "OPS", "wOBA"],
+    "pitching": ["防御率", "WHIP"],
+}
+
 batting_metrics = {
     "打率": {
         "説明": None,
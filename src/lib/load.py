@@ -0,0 +1,222 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from lib.calculate import (
+    calc_batting_data_groupby,
+    calc_inning_points_losts,
+    calc_outs,
+    calc_pitching_data_groupby,
+    calc_score_data_groupby,
+    calc_team_perspective,
+    calc_total,
+    get_teams_url,
+)
+from lib.cube import build_cube
+from lib.filtering import build_filter_index
+from lib.info import comparison_columns, load_columns, team_dict
+from lib.profiling import profiled
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+data_tables = ["score", "batting", "pitching"]
+
+merge_keys = ["game", "game_type", "game_date", "game_day", "game_time"]
+
+category_columns = [
+    "game_type",
+    "game_day",
+    "game_time",
+    "game_place",
+    "team_name_top",
+    "team_name_bottom",
+    "oppo_team",
+    "result",
+    "選手名",
+    "出場",
+    "打順",
+    "守備",
+    "勝敗",
+    "完投",
+    "完封",
+]
+
+
+def get_data_path(team, table):
+    # 列指向形式のファイルがあればそちらを優先する
+    path = f"data/{team}/{table}.parquet"
+    if os.path.exists(path):
+        return path
+    return f"data/{team}/{table}.csv"
+
+
+def has_team_data(team):
+    return all(os.path.exists(get_data_path(team, table)) for table in data_tables)
+
+
+def get_available_teams():
+    # データファイルがそろっているチームだけを選択肢にする
+    return [team for team in team_dict if has_team_data(team)]
+
+
+@profiled
+def read_data(team, table):
+    path = get_data_path(team, table)
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, columns=load_columns[table])
+    return pd.read_csv(path, usecols=load_columns[table])
+
+
+def get_data_version(team):
+    # ファイルの更新時刻とサイズが変わったときだけ読み込み直す
+    version = []
+    for table in data_tables:
+        stat = os.stat(get_data_path(team, table))
+        version.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(version)
+
+
+def downcast_counts(series):
+    values = series.dropna()
+    if not (values % 1 == 0).all():
+        return series
+    if series.isna().any():
+        # 欠損値がある列は nullable な整数型にする
+        if values.abs().max() <= np.iinfo(np.int8).max:
+            return series.astype("Int8")
+        return series.astype("Int16")
+    return pd.to_numeric(series, downcast="integer")
+
+
+def is_inning_column(column):
+    # イニングごとの得失点は平均を計算するため，欠損値をNaNのまま浮動小数点型で持つ
+    return column.endswith("_points") or column.endswith("_losts")
+
+
+def normalize_dtypes(df):
+    # 繰り返し出現する文字列はカテゴリ型，カウント系の列は小さい整数型に変換する
+    df = df.copy()
+    for column in df.columns:
+        if column in category_columns:
+            df[column] = df[column].astype("category")
+        elif (
+            column != "game"
+            and not is_inning_column(column)
+            and pd.api.types.is_numeric_dtype(df[column])
+            and not pd.api.types.is_bool_dtype(df[column])
+        ):
+            df[column] = downcast_counts(df[column])
+    return df
+
+
+def read_score_data(team):
+    score_df = read_data(team, "score")
+    score_df["game_url"] = get_teams_url(score_df["game"], team)
+    score_df["game_date"] = pd.to_datetime(score_df["game_date"])
+
+    perspective = calc_team_perspective(score_df, team_dict[team])
+    score_df["oppo_team"] = perspective["oppo_team"]
+    score_df["result"] = perspective["result"]
+    score_df["points_diff"] = perspective["points_diff"]
+    return score_df
+
+
+def read_stats_data(team, table):
+    stats_df = read_data(team, table)
+    stats_df["game_date"] = pd.to_datetime(stats_df["game_date"])
+    return stats_df
+
+
+def read_team_data(team):
+    score_df = read_score_data(team)
+    batting_df = read_stats_data(team, "batting")
+    pitching_df = read_stats_data(team, "pitching")
+    pitching_df["投球アウト数"] = calc_outs(pitching_df["投球回"])
+    return score_df, batting_df, pitching_df
+
+
+# 全セッションで同じデータフレームを共有するため，呼び出し側で書き換えないこと
+# 選択されたチームだけを読み込み，古いチームから順に破棄する
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _load_team_data(team, version):
+    return tuple(normalize_dtypes(df) for df in read_team_data(team))
+
+
+def load_team_data(team):
+    return _load_team_data(team, get_data_version(team))
+
+
+def merge_page_data(team, page, score_df, batting_df, pitching_df):
+    if page == "score":
+        perspective = calc_team_perspective(score_df, team_dict[team])
+        df = score_df.assign(points=perspective["points"], losts=perspective["losts"])
+        df = pd.concat([df, calc_inning_points_losts(df, team_dict[team])], axis=1)
+    elif page == "batting":
+        df = pd.merge(score_df, batting_df, on=merge_keys)
+    elif page == "pitching":
+        df = pd.merge(score_df, pitching_df, on=merge_keys)
+    return df
+
+
+@profiled
+def build_page_data(team, page, score_df, batting_df, pitching_df):
+    df = normalize_dtypes(
+        merge_page_data(team, page, score_df, batting_df, pitching_df)
+    )
+    cube = None if page == "score" else build_cube(df, team, page)
+    return df, build_filter_index(df, team), cube
+
+
+@st.cache_resource(max_entries=24, show_spinner=False)
+def _load_page_data(team, page, version):
+    return build_page_data(team, page, *_load_team_data(team, version))
+
+
+def load_page_data(team, page):
+    return _load_page_data(team, page, get_data_version(team))
+
+
+def build_team_summary(team):
+    # 比較用の集計値だけを残し，チームのデータフレームはキャッシュに載せない
+    tables = read_team_data(team)
+    funcs = {
+        "score": calc_score_data_groupby,
+        "batting": calc_batting_data_groupby,
+        "pitching": calc_pitching_data_groupby,
+    }
+    summary = pd.concat(
+        [
+            calc_total(merge_page_data(team, page, *tables), func)[
+                comparison_columns[page]
+            ].reset_index(drop=True)
+            for page, func in funcs.items()
+        ],
+        axis=1,
+    )
+    summary.index = [team_dict[team]]
+    return summary
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def _load_team_summary(team, version):
+    return build_team_summary(team)
+
+
+def load_team_summary(team):
+    try:
+        return _load_team_summary(team, get_data_version(team))
+    except (FileNotFoundError, IndexError):
+        # ファイルがない・試合がないチームは比較から除く
+        return None
+
+
+def load_team_summaries(teams, workers=4):
+    # チームごとの集計を並行して行う（集計結果はチームごとにキャッシュする）
+    with ThreadPoolExecutor(
+        max_workers=workers,
+        initializer=add_script_run_ctx,
+        initargs=(None, get_script_run_ctx()),
+    ) as executor:
+        summaries = dict(zip(teams, executor.map(load_team_summary, teams)))
+    return summaries
@@ -0,0 +1,88 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+# セッションごとにスクリプトを実行するスレッドが分かれるため，スレッドごとに記録する
+_state = threading.local()
+
+
+def get_log_path():
+    return os.environ.get("PROFILE_LOG", "profile.jsonl")
+
+
+def is_enabled():
+    # 環境変数 PROFILE=1 または URL の ?profile=1 で有効にする
+    if os.environ.get("PROFILE") == "1":
+        return True
+    return st.query_params.get("profile") == "1"
+
+
+def start_profile():
+    _state.records = [] if is_enabled() else None
+    _state.depth = 0
+    _state.started_at = time.perf_counter()
+
+
+@contextmanager
+def stage(name):
+    records = getattr(_state, "records", None)
+    if records is None:
+        yield
+        return
+    # 入れ子の処理は深さを記録し，外側の処理の時間に含める
+    record = {"stage": name, "depth": _state.depth, "ms": None}
+    records.append(record)
+    _state.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record["ms"] = (time.perf_counter() - start) * 1000
+        _state.depth -= 1
+
+
+def profiled(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with stage(func.__name__):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def write_log(entry):
+    with open(get_log_path(), "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def finish_profile(page, team):
+    records = getattr(_state, "records", None)
+    if records is None:
+        return
+    _state.records = None
+    total_ms = (time.perf_counter() - _state.started_at) * 1000
+    write_log(
+        {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "page": page,
+            "team": team,
+            "total_ms": total_ms,
+            "stages": records,
+        }
+    )
+
+    df = pd.DataFrame(records, columns=["stage", "depth", "ms"])
+    df["stage"] = ["　" * depth + name for name, depth in zip(df["stage"], df["depth"])]
+    with st.sidebar.expander("処理時間", expanded=True):
+        st.write(f"合計: {total_ms:.1f} ms")
+        st.dataframe(
+            df[["stage", "ms"]].style.format({"ms": "{:.1f}"}),
+            hide_index=True,
+        )
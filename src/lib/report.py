@@ -0,0 +1,367 @@
+import numpy as np
+import pandas as pd
+from lib.calculate import (
+    calc_batting_data_groupby,
+    calc_batting_rolling,
+    calc_inning_losts_mean_groupby,
+    calc_inning_points_mean_groupby,
+    calc_pitching_data_groupby,
+    calc_pitching_rolling,
+    calc_score_data_groupby,
+    calc_total,
+    get_innings,
+)
+from lib.cube import select_source
+from lib.date_sums import (
+    calc_date_range_data,
+    calc_date_range_term_data,
+    is_date_sums_supported,
+)
+from lib.filtering import filtering_df
+from lib.info import position_list, rolling_columns
+from lib.profiling import profiled
+
+# 画面に表示する表をstreamlitを使わずにDataFrameとして計算する
+# すべての条件を選択しない場合のフィルタ
+all_options = {
+    "game_type": "すべて",
+    "attack_type": "すべて",
+    "result_type": "すべて",
+    "point_diff": "すべて",
+    "term": "すべて",
+    "oppo_team": "すべて",
+    "game_place": "すべて",
+    "point_diff_num": None,
+    "term_1": None,
+    "term_2": None,
+}
+
+
+def calc_inning_points_mean(df):
+    return {f"{i}回": df[f"{i}_points"].mean() for i in get_innings(df, "points")}
+
+
+def calc_inning_losts_mean(df):
+    return {f"{i}回": df[f"{i}_losts"].mean() for i in get_innings(df, "losts")}
+
+
+def calc_win_rate(df):
+    if "result" in df.columns:
+        win = df[df["result"] == "○"].shape[0]
+        lose = df[df["result"] == "☓"].shape[0]
+    else:
+        win = df[df["結果"] == "○"].shape[0]
+        lose = df[df["結果"] == "☓"].shape[0]
+    try:
+        return win / (win + lose)
+    except ZeroDivisionError:
+        return 0
+
+
+def calc_score_data(_scene_df):
+    return {
+        "勝ち": _scene_df[_scene_df["result"] == "○"].shape[0],
+        "負け": _scene_df[_scene_df["result"] == "☓"].shape[0],
+        "引き分け": _scene_df[_scene_df["result"] == "△"].shape[0],
+        "勝率": calc_win_rate(_scene_df),
+        "合計得点": _scene_df["points"].sum(),
+        "合計失点": _scene_df["losts"].sum(),
+        "合計得失点差": _scene_df["points_diff"].sum(),
+        "1試合平均得点": _scene_df["points"].mean(),
+        "1試合平均失点": _scene_df["losts"].mean(),
+        "1試合平均得失点差": _scene_df["points_diff"].mean(),
+    }
+
+
+def calc_batting_data(_batting_df):
+    # 全体を1グループとして集計する
+    group = np.zeros(_batting_df.shape[0], dtype=int)
+    return calc_batting_data_groupby(_batting_df, group).to_dict("records")[0]
+
+
+def calc_pitching_data(_pitching_df):
+    # 全体を1グループとして集計する
+    group = np.zeros(_pitching_df.shape[0], dtype=int)
+    return calc_pitching_data_groupby(_pitching_df, group).to_dict("records")[0]
+
+
+def sort_key(item):
+    try:
+        return position_list.index(item)
+    except ValueError:
+        return len(position_list)
+
+
+def get_term_keys(df):
+    # 集計済みのセルは年・月の列を持つ
+    if "year" in df.columns:
+        return df["year"], df["month"]
+    game_date = pd.to_datetime(df["game_date"])
+    return game_date.dt.year, game_date.dt.month
+
+
+def get_unique_terms(df):
+    years, months = get_term_keys(df)
+    return years.unique(), np.sort(months.unique())
+
+
+def get_unique_orders(df, max_order=None):
+    unique_order = list(df["打順"].unique())
+    unique_order = [int(i) for i in unique_order if i not in ["-"]]
+    if max_order is not None:
+        unique_order = [i for i in unique_order if i <= max_order]
+    return np.sort(unique_order)
+
+
+def get_unique_positions(df):
+    unique_positions = list(df["守備"].unique())
+    unique_positions = [pos for pos in unique_positions if pos not in ["-"]]
+    return sorted(unique_positions, key=sort_key)
+
+
+def filter_by_options(df, team, selected_options, filter_index=None, groupby=None):
+    return filtering_df(
+        df,
+        team,
+        selected_options["game_type"],
+        selected_options["attack_type"],
+        selected_options["result_type"],
+        selected_options["point_diff"],
+        selected_options["term"],
+        selected_options["oppo_team"],
+        selected_options["game_place"],
+        selected_options["point_diff_num"],
+        selected_options["term_1"],
+        selected_options["term_2"],
+        selected_options.get("order"),
+        selected_options.get("position"),
+        groupby=groupby,
+        filter_index=filter_index,
+    )
+
+
+@profiled
+def calc_conditional_data(
+    df,
+    func,
+    conditional_type=None,
+    team=None,
+    unique_years=None,
+    unique_months=None,
+    unique_order=None,
+    unique_positions=None,
+):
+    # funcは (df, グループキー) を受け取りグループごとの成績を返す関数
+    if conditional_type == "term":
+        # 期間別
+        years, months = get_term_keys(df)
+        term_results = pd.concat(
+            [
+                calc_total(df, func),
+                func(df, years).reindex(unique_years),
+                func(df, months).reindex(unique_months),
+            ]
+        )
+        term_results.index = (
+            ["すべて"]
+            + [f"{year}年" for year in unique_years]
+            + [f"{month}月" for month in unique_months]
+        )
+        return term_results
+    elif conditional_type == "order":
+        # 打順別
+        if len(unique_order) == 0:
+            raise IndexError("no order data")
+        order_results = func(df, "打順").reindex([str(i) for i in unique_order])
+        order_results.index = [i for i in unique_order]
+        return order_results
+    elif conditional_type == "position":
+        # 守備別
+        if len(unique_positions) == 0:
+            raise IndexError("no position data")
+        position_results = func(df, "守備").reindex(unique_positions)
+        position_results.index = unique_positions
+        return position_results
+
+
+def calc_term_data(df, func, team=None):
+    unique_years, unique_months = get_unique_terms(df)
+    return calc_conditional_data(df, func, "term", team, unique_years, unique_months)
+
+
+@profiled
+def calc_team_term_data(
+    df, func, team=None, selected_options=None, filter_index=None, cube=None
+):
+    if cube is not None and is_date_sums_supported(selected_options):
+        return calc_date_range_term_data(
+            cube["date_sums"], selected_options["term_1"], selected_options["term_2"]
+        )
+    df, func, filter_index = select_source(
+        df, func, filter_index, cube, selected_options
+    )
+    _df = filter_by_options(df, team, selected_options, filter_index=filter_index)
+    return calc_term_data(_df, func, team)
+
+
+def calc_order_data(df, func, team=None, max_order=None):
+    return calc_conditional_data(
+        df, func, "order", team, unique_order=get_unique_orders(df, max_order)
+    )
+
+
+def calc_position_data(df, func, team=None):
+    return calc_conditional_data(
+        df, func, "position", team, unique_positions=get_unique_positions(df)
+    )
+
+
+@profiled
+def calc_player_data(
+    df, func, team=None, selected_options=None, filter_index=None, cube=None
+):
+    df, func, filter_index = select_source(
+        df, func, filter_index, cube, selected_options
+    )
+    if cube is not None and is_date_sums_supported(selected_options):
+        players_df = calc_date_range_data(
+            cube["date_sums"], selected_options["term_1"], selected_options["term_2"]
+        )
+    else:
+        _df = filter_by_options(
+            df, team, selected_options, filter_index=filter_index, groupby="選手名"
+        )
+        players_df = func(_df, "選手名")
+    # 通算規定打席数
+    if "regulation" in selected_options:
+        plate_appearances = df.groupby("選手名", observed=True)["打席"].sum()
+        regular_players = plate_appearances[
+            plate_appearances >= selected_options["regulation"]
+        ].index
+        players_df = players_df[players_df.index.isin(regular_players)]
+    players_df.index = players_df.index.astype(object)
+    players_df.index.name = None
+    players_df["背番号"] = pd.to_numeric(players_df["背番号"], errors="coerce")
+    players_df = players_df.dropna(subset=["背番号"])
+    players_df["背番号"] = players_df["背番号"].astype(int)
+    return players_df.sort_values("背番号")
+
+
+def calc_rolling_data(df, page, window):
+    # 各試合の時点での直近window試合の成績
+    calc_rolling = {"batting": calc_batting_rolling, "pitching": calc_pitching_rolling}
+    rolling = calc_rolling[page](df, window)
+    return rolling.set_index("game_date")[rolling_columns[page]]
+
+
+def calc_filtered_data(df, calc):
+    # フィルタ後の全体の成績を1行の表にする
+    filtered_result = pd.DataFrame([calc(df)])
+    filtered_result.index = ["フィルタ後"]
+    return filtered_result
+
+
+def calc_inning_data(score_df):
+    win_df = score_df[score_df["result"] == "○"]
+    lose_df = score_df[score_df["result"] == "☓"]
+    inning_score = pd.DataFrame(
+        [
+            calc_inning_points_mean(score_df),
+            calc_inning_losts_mean(score_df),
+            calc_inning_points_mean(win_df),
+            calc_inning_losts_mean(win_df),
+            calc_inning_points_mean(lose_df),
+            calc_inning_losts_mean(lose_df),
+        ]
+    )
+    inning_score.index = [
+        "平均得点",
+        "平均失点",
+        "平均得点(勝)",
+        "平均失点(勝)",
+        "平均得点(負)",
+        "平均失点(負)",
+    ]
+    return inning_score.T
+
+
+def calc_score_term_data(score_df, team=None):
+    return calc_term_data(score_df, calc_score_data_groupby, team)
+
+
+def select_player_data(score_df, batting_df, pitching_df, player_name):
+    batting_df = batting_df[batting_df["選手名"] == player_name]
+    pitching_df = pitching_df[pitching_df["選手名"] == player_name]
+    batting_df = pd.merge(
+        score_df, batting_df, on=["game_type", "game_date", "game_day", "game_time"]
+    )
+    pitching_df = pd.merge(
+        score_df, pitching_df, on=["game_type", "game_date", "game_day", "game_time"]
+    )
+    return batting_df, pitching_df
+
+
+def collect_tables(funcs):
+    # データがなく計算できない表は含めない
+    tables = {}
+    for name, func in funcs.items():
+        try:
+            tables[name] = func()
+        except (IndexError, KeyError):
+            continue
+    return tables
+
+
+def calc_score_page(score_df, team):
+    return collect_tables(
+        {
+            "summary": lambda: calc_filtered_data(score_df, calc_score_data),
+            "term": lambda: calc_score_term_data(score_df, team),
+            "inning": lambda: calc_inning_data(score_df),
+            "inning_points_term": lambda: calc_term_data(
+                score_df, calc_inning_points_mean_groupby, team
+            ),
+            "inning_losts_term": lambda: calc_term_data(
+                score_df, calc_inning_losts_mean_groupby, team
+            ),
+        }
+    )
+
+
+def calc_batting_page(batting_df, team):
+    func = calc_batting_data_groupby
+    return collect_tables(
+        {
+            "players": lambda: calc_player_data(batting_df, func, team, all_options),
+            "term": lambda: calc_term_data(batting_df, func, team),
+            "order": lambda: calc_order_data(batting_df, func, team, max_order=9),
+            "position": lambda: calc_position_data(batting_df, func, team),
+        }
+    )
+
+
+def calc_pitching_page(pitching_df, team):
+    func = calc_pitching_data_groupby
+    return collect_tables(
+        {
+            "players": lambda: calc_player_data(pitching_df, func, team, all_options),
+            "term": lambda: calc_term_data(pitching_df, func, team),
+        }
+    )
+
+
+def calc_player_page(batting_df, pitching_df, team):
+    batting_func = calc_batting_data_groupby
+    pitching_func = calc_pitching_data_groupby
+    return collect_tables(
+        {
+            "batting": lambda: calc_filtered_data(batting_df, calc_batting_data),
+            "batting_term": lambda: calc_term_data(batting_df, batting_func, team),
+            "batting_order": lambda: calc_order_data(batting_df, batting_func, team),
+            "batting_position": lambda: calc_position_data(
+                batting_df, batting_func, team
+            ),
+            "pitching": lambda: calc_filtered_data(pitching_df, calc_pitching_data),
+            "pitching_term": lambda: calc_term_data(pitching_df, pitching_func, team),
+        }
+    )
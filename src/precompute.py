@@ -0,0 +1,87 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from lib.load import (
+    build_page_data,
+    get_available_teams,
+    normalize_dtypes,
+    read_team_data,
+)
+from lib.report import (
+    calc_batting_page,
+    calc_pitching_page,
+    calc_player_page,
+    calc_score_page,
+    select_player_data,
+)
+
+pages = ["score", "batting", "pitching", "player"]
+
+
+def load_tables(team):
+    return [normalize_dtypes(df) for df in read_team_data(team)]
+
+
+def get_players(batting_df):
+    players = batting_df[["背番号", "選手名"]].drop_duplicates()
+    players = players[players["背番号"].astype(str).str.isdigit()]
+    return players["選手名"].astype(str).unique()
+
+
+def calc_page(team, page):
+    tables = load_tables(team)
+    if page == "player":
+        # 選手ごとのフォルダに分けて保存する
+        results = {}
+        for player in get_players(tables[1]):
+            batting_df, pitching_df = select_player_data(*tables, player)
+            for name, df in calc_player_page(batting_df, pitching_df, team).items():
+                results[f"player/{player}/{name}"] = df
+        return results
+    df, _, _ = build_page_data(team, page, *tables)
+    if page == "score":
+        results = calc_score_page(df, team)
+    elif page == "batting":
+        results = calc_batting_page(df, team)
+    elif page == "pitching":
+        results = calc_pitching_page(df, team)
+    return {f"{page}/{name}": result for name, result in results.items()}
+
+
+def write_page(output, team, page):
+    # プロセス間で表を受け渡さず，各プロセスが直接ファイルに書き出す
+    paths = []
+    for name, df in calc_page(team, page).items():
+        path = f"{output}/{team}/{name}.parquet"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_parquet(f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        paths.append(path)
+    return team, page, paths
+
+
+def main(args):
+    start = time.perf_counter()
+    teams = args.teams or get_available_teams()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(write_page, args.output, team, page)
+            for team in teams
+            for page in pages
+        ]
+        for future in futures:
+            team, page, paths = future.result()
+            print(f"{team} {page}: {len(paths)} tables")
+    print(f"elapsed: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    # 指定しない場合はデータファイルがあるすべてのチーム
+    parser.add_argument("--teams", type=str, nargs="+", default=None)
+    parser.add_argument("--output", type=str, default="reports")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    main(args)
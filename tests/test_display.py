@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+from lib.display import calc_color_styles, cm1, cm2
+
+
+def get_gradient_styles(df, low_better_list, axis):
+    # 従来のbackground_gradientで付けていた色（後から付けた色が優先される）
+    styler = df.style.background_gradient(cmap=cm1, axis=axis)
+    styler = styler.background_gradient(cmap=cm2, axis=axis, subset=low_better_list)
+    styles = pd.DataFrame("", index=df.index, columns=df.columns)
+    for (row, col), props in styler._compute().ctx.items():
+        props = dict(props)
+        styles.iloc[row, col] = (
+            f"background-color: {props['background-color']};"
+            f"color: {props['color']};"
+        )
+    return styles
+
+
+def test_color_styles_match_background_gradient():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.random((6, 4)), columns=["a", "b", "c", "d"])
+    df.iloc[2, 1] = np.nan
+    df["d"] = 1.0
+    for axis in [0, 1]:
+        pd.testing.assert_frame_equal(
+            calc_color_styles(df, ["b", "c"], axis),
+            get_gradient_styles(df, ["b", "c"], axis),
+        )
+
+
+def test_color_styles_with_missing_values():
+    # pd.NAを含むobject型の列も数値として色を付ける
+    df = pd.DataFrame(
+        {
+            "平均得点": pd.Series([1.0, pd.NA, 0.5], dtype=object),
+            "平均失点": pd.Series([pd.NA, 2.0, 1.5], dtype=object),
+            "選手名": ["a", "b", "c"],
+        }
+    )
+    styles = calc_color_styles(df, ["平均失点", "選手名"], axis=0)
+    expected = get_gradient_styles(
+        pd.DataFrame({"平均得点": [1.0, np.nan, 0.5], "平均失点": [np.nan, 2.0, 1.5]}),
+        ["平均失点"],
+        axis=0,
+    )
+    pd.testing.assert_frame_equal(styles[["平均得点", "平均失点"]], expected)
+    assert (styles["選手名"] == "").all()
+
+
+def test_color_styles_without_rows():
+    df = pd.DataFrame({"打率": pd.Series([], dtype=float)})
+    assert calc_color_styles(df, ["打率"]).shape == (0, 1)
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+from lib.calculate import (
+    calc_pitching_data_groupby,
+    get_pitching_counts,
+    pitching_count_columns,
+)
+from lib.date_sums import build_date_sums, calc_date_range_term_data
+from lib.report import calc_order_data, calc_position_data, calc_term_data
+
+
+def test_order_and_position_without_rows():
+    # 条件に合う打順・守備がない場合は表を作らない
+    df = pd.DataFrame({"打順": ["-"], "守備": ["-"], "打席": [1]})
+
+    def func(_df, key):
+        return _df.groupby(key).sum()
+
+    with pytest.raises(IndexError):
+        calc_order_data(df, func, max_order=9)
+    with pytest.raises(IndexError):
+        calc_position_data(df, func)
+
+
+def test_date_range_term_data_matches_rows():
+    # 累積和の差から求めた期間別の成績が元の行の集計と一致する
+    rng = np.random.default_rng(0)
+    size = 120
+    game_date = np.sort(
+        pd.Timestamp("2021-11-20") + pd.to_timedelta(rng.integers(0, 150, size), "D")
+    )[::-1]
+    df = pd.DataFrame(
+        {
+            "選手名": rng.choice(["a", "b", "c"], size),
+            "背番号": pd.array(rng.choice([1, 2, None], size), dtype="Int64"),
+            "game_date": game_date,
+            "勝敗": rng.choice(["勝", "負", "-"], size),
+            "完投": rng.choice(["◯", "-"], size),
+            "完封": rng.choice(["◯", "-"], size),
+        }
+    )
+    for column in pitching_count_columns:
+        df[column] = rng.integers(0, 5, size)
+    date_sums = build_date_sums(df, get_pitching_counts(df), "pitching")
+    for date1, date2 in [("2021-12-10", "2022-03-05"), ("2021-01-01", "2022-12-31")]:
+        _df = df[(df["game_date"] >= date1) & (df["game_date"] <= date2)]
+        pd.testing.assert_frame_equal(
+            calc_date_range_term_data(date_sums, date1, date2),
+            calc_term_data(_df, calc_pitching_data_groupby),
+            check_dtype=False,
+        )
+    with pytest.raises(IndexError):
+        calc_date_range_term_data(date_sums, "2020-01-01", "2020-12-31")